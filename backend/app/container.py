@@ -0,0 +1,153 @@
+import logging
+import threading
+from typing import Any, Callable, Dict
+from backend.config import SESSION_SWEEP_INTERVAL_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """
+    Application-scoped holder of the shared services.
+
+    Every service is constructed on first use, together with the modules it needs, so importing
+    the application stays cheap and a worker only pays for the clients it actually uses. All
+    callers share the same instances, e.g. one DocumentManager and therefore one vector store.
+
+    Tests and benchmarks can replace services with fakes through `override`.
+
+    Once the document manager exists, a background thread periodically releases the documents and
+    loading jobs of users whose sessions expired (see `sweep_expired_sessions`).
+    """
+
+    def __init__(self) -> None:
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.RLock()  # Services are built from other services
+        self._sweep_stop = threading.Event()
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = factory()
+        return instance
+
+    def override(self, **instances: Any) -> None:
+        """
+        Replaces services, e.g. with fakes. Must be called before the services are first used.
+
+        Args:
+            **instances (Any): The services by name, e.g. `gemini_service=FakeGeminiService()`.
+        """
+        with self._lock:
+            self._instances.update(instances)
+
+    def reset(self) -> None:
+        """Drops all services, so they are constructed anew on next use."""
+        with self._lock:
+            self._instances.clear()
+            self._sweep_stop.set()
+            self._sweep_stop = threading.Event()
+
+    @property
+    def gemini_service(self):
+        def create():
+            from backend.services.gemini_service import GeminiService
+            return GeminiService()
+        return self._get("gemini_service", create)
+
+    @property
+    def llm_chains(self):
+        def create():
+            from backend.app.langchain.chains import LLMChains
+            return LLMChains(gemini_service=self.gemini_service)
+        return self._get("llm_chains", create)
+
+    @property
+    def google_doc_loader(self):
+        def create():
+            from backend.services.google_drive_loader import GoogleDocLoader
+            return GoogleDocLoader()
+        return self._get("google_doc_loader", create)
+
+    @property
+    def memory_manager(self):
+        def create():
+            from backend.app.memory_manager import ChatbotMemoryManager
+            from backend.app.ingestion_jobs import ingestion_jobs
+            from backend.services.metrics import register_stats
+            memory_manager = ChatbotMemoryManager()
+            # Stop loading documents of users whose sessions expire
+            memory_manager.add_eviction_listener(ingestion_jobs.cancel_user)
+            register_stats("sessions", memory_manager.stats, {
+                "sessions": ("chatbot_sessions", "gauge", "Live chat sessions"),
+                "bytes": ("chatbot_session_bytes", "gauge", "Bytes held by the live chat sessions")
+            })
+            return memory_manager
+        return self._get("memory_manager", create)
+
+    @property
+    def document_manager(self):
+        def create():
+            from backend.app.document_manager import DocumentManager
+            from backend.services.metrics import register_stats
+            document_manager = DocumentManager(google_doc_loader=self.google_doc_loader,
+                                               gemini_service=self.gemini_service,
+                                               llm_chains=self.llm_chains)
+            # Release the documents of users whose sessions expire, or were lost in a restart
+            self.memory_manager.add_eviction_listener(document_manager.delete_user_data)
+            orphaned = document_manager.delete_orphaned_data(self.memory_manager.has_session)
+            if orphaned:
+                logger.info("Deleted the stored documents of %d users without a session", orphaned)
+            if SESSION_SWEEP_INTERVAL_SECONDS > 0:
+                threading.Thread(target=self._sweep_periodically, args=(self._sweep_stop,),
+                                 name="session-sweep", daemon=True).start()
+            if document_manager.response_cache:
+                register_stats("response_cache", document_manager.response_cache.stats, {
+                    "hits": ("chatbot_response_cache_hits", "counter", "Generated test cases served from the cache"),
+                    "misses": ("chatbot_response_cache_misses", "counter", "Test case lookups not found in the cache"),
+                    "items": ("chatbot_response_cache_items", "gauge", "Generated test cases held in the cache")
+                })
+            return document_manager
+        return self._get("document_manager", create)
+
+    @property
+    def agent_executor(self):
+        def create():
+            from backend.app.langchain.agent import build_agent_executor
+            return build_agent_executor()
+        return self._get("agent_executor", create)
+
+    def sweep_expired_sessions(self) -> None:
+        """
+        Releases the documents and loading jobs of users whose sessions expired. Sessions in Redis expire
+        on the server, which does not notify the eviction listeners.
+        """
+        from backend.app.ingestion_jobs import ingestion_jobs
+        has_session = self.memory_manager.has_session
+        for user_id in ingestion_jobs.get_user_ids():
+            if not has_session(user_id):
+                ingestion_jobs.cancel_user(user_id)
+        orphaned = self.document_manager.delete_orphaned_data(has_session)
+        if orphaned:
+            logger.info("Deleted the stored documents of %d users whose sessions expired", orphaned)
+
+    def _sweep_periodically(self, stop: threading.Event) -> None:
+        while not stop.wait(SESSION_SWEEP_INTERVAL_SECONDS):
+            try:
+                self.sweep_expired_sessions()
+            except Exception:
+                logger.exception("Failed to release the data of expired sessions")
+
+    def warm_up(self) -> None:
+        """Constructs all services up front, so that the first requests do not pay for it."""
+        self.memory_manager
+        self.document_manager
+        self.agent_executor
+        logger.info("Services warmed up")
+
+
+services = ServiceContainer()
@@ -1,9 +1,20 @@
-from typing import List
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import hashlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 from backend.app.langchain.chains import LLMChains
 from backend.services.google_drive_loader import GoogleDocLoader
 from backend.services.vector_db import VectorDB
+from backend.services.vector_index import VectorIndexFactory
+from backend.services.chunker import StructuralChunker
 from backend.services.gemini_service import GeminiService
+from backend.services.retrieval import LexicalReranker, ContextPacker
+from backend.services.response_cache import ResponseCache
+from backend.services.metrics import trace_stage
+from backend.config import (VECTOR_DB_PATH, VECTOR_INDEX_TYPE, HNSW_M, HNSW_EF_SEARCH, IVF_TRAIN_THRESHOLD,
+                            IVF_NPROBE, PQ_M, CHUNK_MAX_TOKENS, RETRIEVAL_TOP_K, RETRIEVAL_DISTANCE_THRESHOLD,
+                            RERANK_ENABLED, RERANK_WEIGHT, CONTEXT_MAX_TOKENS, RESPONSE_CACHE_SIZE,
+                            RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_SIMILARITY_THRESHOLD)
 
 
 class DocumentManager:
@@ -12,46 +23,183 @@ class DocumentManager:
     including Google Doc loading, storing content in a vector DB, and utilizing LLM (GeminiService).
     """
 
-    def __init__(self):
-        self.google_doc_loader = GoogleDocLoader()
-        self.vector_db = VectorDB()
-        self.gemini_service = GeminiService()
-        self.llm_chains = LLMChains()
+    def __init__(self, google_doc_loader: Optional[GoogleDocLoader] = None,
+                 gemini_service: Optional[GeminiService] = None, llm_chains: Optional[LLMChains] = None):
+        self.google_doc_loader = google_doc_loader or GoogleDocLoader()
+        index_factory = VectorIndexFactory(index_type=VECTOR_INDEX_TYPE, hnsw_m=HNSW_M, hnsw_ef_search=HNSW_EF_SEARCH,
+                                           train_threshold=IVF_TRAIN_THRESHOLD, ivf_nprobe=IVF_NPROBE, pq_m=PQ_M)
+        self.vector_db = VectorDB(persist_dir=VECTOR_DB_PATH, index_factory=index_factory)
+        self.gemini_service = gemini_service or GeminiService()
+        self.llm_chains = llm_chains or LLMChains(gemini_service=self.gemini_service)
+        self.chunker = StructuralChunker(max_tokens=CHUNK_MAX_TOKENS)
+        self.reranker = LexicalReranker(weight=RERANK_WEIGHT) if RERANK_ENABLED else None
+        self.context_packer = ContextPacker(max_tokens=CONTEXT_MAX_TOKENS)
+        self.response_cache = ResponseCache(
+            max_items=RESPONSE_CACHE_SIZE, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+            similarity_threshold=RESPONSE_CACHE_SIMILARITY_THRESHOLD
+        ) if RESPONSE_CACHE_SIZE > 0 else None
+        self.search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="vector-search")
 
-    def load_and_store_document(self, doc_link: str, collection: str, user_id: str) -> None:
+    def _prepare_chunks(self, blocks: List[Dict], revision_id: str, collection: str,
+                        user_id: str) -> Optional[Tuple[List[str], List[str], List[dict]]]:
+        """
+        Splits the document into chunks and builds their IDs and metadata.
+
+        Returns:
+            Optional[Tuple[List[str], List[str], List[dict]]]: The chunks, doc IDs and metadata,
+                                                               or None if this revision is already stored.
+        """
+        # Nothing to do if this revision of the document is already stored for the user
+        stored_metadata = self.vector_db.get_metadata(collection=collection, user_id=user_id)
+        if stored_metadata and all(meta.get("revision_id") == revision_id for meta in stored_metadata.values()):
+            return None
+
+        # Split document content along its sections into token-bounded chunks
+        with trace_stage("chunk"):
+            sections = self.chunker.split(blocks)
+        chunks_to_store = [text for text, _ in sections]
+
+        # Chunk IDs are derived from the content, so unchanged chunks keep their IDs across revisions
+        doc_ids, metadata = [], []
+        occurrences = Counter()
+        for text, section_path in sections:
+            path = " > ".join(section_path)
+            content_hash = hashlib.sha256(f"{path}\0{text}".encode("utf-8")).hexdigest()[:16]
+            occurrences[content_hash] += 1
+            if occurrences[content_hash] > 1:  # The same text repeated within a section
+                content_hash = f"{content_hash}-{occurrences[content_hash]}"
+            doc_ids.append(f"{user_id}_{collection}_{content_hash}")
+            # Metadata to filter by user ID and to tell which revision of the document is stored
+            metadata.append({"user_id": user_id, "revision_id": revision_id, "section_path": path,
+                             "content_hash": content_hash})
+
+        return chunks_to_store, doc_ids, metadata
+
+    def _find_new_chunks(self, doc_ids: List[str], collection: str, user_id: str) -> List[int]:
+        """Returns the positions of the chunks that are not stored yet (added or modified since the last load)."""
+        stored_doc_ids = self.vector_db.get_doc_ids(collection=collection, user_id=user_id)
+        return [i for i, doc_id in enumerate(doc_ids) if doc_id not in stored_doc_ids]
+
+    def _store_chunks(self, chunks: List[str], embeddings: List[List[float]], doc_ids: List[str],
+                      metadata: List[dict], collection: str, user_id: str, new_positions: List[int]) -> None:
+        """
+        Makes the given chunks the stored content of the user's document in the collection.
+
+        Only the new chunks (at `new_positions`, with `embeddings` in the same order) are indexed;
+        chunks that are no longer part of the document are removed and the others are kept.
+        """
+        stored_metadata = self.vector_db.get_metadata(collection=collection, user_id=user_id)
+
+        # Test cases generated from the previous revision of the document are outdated
+        if self.response_cache:
+            outdated_revisions = ({meta.get("revision_id") for meta in stored_metadata.values()}
+                                  - {meta["revision_id"] for meta in metadata})
+            self.response_cache.invalidate(outdated_revisions)
+
+        # Remove chunks that were modified or deleted since the previous revision
+        stale_doc_ids = set(stored_metadata) - set(doc_ids)
+        self.vector_db.delete_data(collection=collection, user_id=user_id, doc_ids=list(stale_doc_ids))
+
+        with trace_stage("index"):
+            if new_positions:
+                self.vector_db.store_data(chunks=[chunks[i] for i in new_positions], embeddings=embeddings,
+                                          doc_ids=[doc_ids[i] for i in new_positions], collection=collection,
+                                          metadata=[metadata[i] for i in new_positions])
+
+            # Unchanged chunks keep their vectors, only their revision is updated
+            self.vector_db.update_metadata(collection=collection, user_id=user_id, metadata={
+                doc_id: meta for doc_id, meta in zip(doc_ids, metadata)
+                if doc_id in stored_metadata and stored_metadata[doc_id] != meta
+            })
+
+    def load_and_store_document(self, doc_link: str, collection: str, user_id: str,
+                                on_progress: Optional[Callable[[str, int], None]] = None,
+                                is_cancelled: Optional[Callable[[], bool]] = None) -> None:
         """
         Loads the document from Google Docs, extracts its content, and stores it in the vector database.
+        Re-loading a document replaces the user's previously stored chunks of that collection,
+        unless the same revision of the document is already stored. Only the chunks that were added or
+        modified since the stored revision are embedded, so a reload costs as much as the edit.
 
         Args:
             doc_link (str): The URL of the Google Document.
             collection (str): The name of the vector database collection.
             user_id (str): The unique identifier of the user.
+            on_progress (Optional[Callable[[str, int], None]]): Called with each finished stage
+                                                                ("fetched", "chunked", "embedded", "indexed")
+                                                                and the number of blocks or chunks it handled
+                                                                (the chunks embedded are only the new ones).
+            is_cancelled (Optional[Callable[[], bool]]): Checked before embedding and before storing;
+                                                         once it returns True, the document is not stored.
         """
+        report = on_progress or (lambda stage, count: None)
+        is_cancelled = is_cancelled or (lambda: False)
+
         # Get content of Google document
-        doc_content = self.google_doc_loader.load_document(doc_link)
-
-        # Splits document content by 'Feature X:' blocks
-        regex_separator = r"(Feature \d+:.*?)(?=\n\s*Feature \d+:|\Z)"
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000000,
-            chunk_overlap=0,
-            separators=[regex_separator],
-            is_separator_regex=True
-        )
-        chunks_to_store = text_splitter.split_text(doc_content)
+        blocks, revision_id = self.google_doc_loader.fetch_document_blocks(doc_link)
+        report("fetched", len(blocks))
 
-        # Embed split features (chunks)
-        embeddings = self.embed_content(content=chunks_to_store, task_type='retrieval_document')
+        prepared = self._prepare_chunks(blocks, revision_id, collection, user_id)
+        if prepared is None or is_cancelled():
+            return
+        chunks, doc_ids, metadata = prepared
+        report("chunked", len(chunks))
 
-        # Create list of unique IDs for each document chunk
-        doc_ids = [f"{user_id}_{collection}_f{i}" for i in range(len(chunks_to_store))]
+        # Embed the split features (chunks) that are not stored yet
+        new_positions = self._find_new_chunks(doc_ids, collection, user_id)
+        embeddings = self.embed_content(content=[chunks[i] for i in new_positions], task_type='retrieval_document')
+        report("embedded", len(embeddings))
+        if is_cancelled():
+            return
 
-        # Create list of metadata dictionaries for each document chunk (to filter by user ID)
-        metadata = [{"user_id": user_id} for _ in chunks_to_store]
+        self._store_chunks(chunks, embeddings, doc_ids, metadata, collection, user_id, new_positions)
+        report("indexed", len(chunks))
 
-        # Save the document content in the vector database
-        self.vector_db.store_data(chunks=chunks_to_store, embeddings=embeddings,
-                                  doc_ids=doc_ids, collection=collection, metadata=metadata)
+    def delete_user_data(self, user_id: str, collection: Optional[str] = None) -> None:
+        """
+        Removes the documents stored for the user from the vector database.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+            collection (Optional[str]): The collection to remove the user's documents from. All if omitted.
+        """
+        if collection is None:
+            self.vector_db.delete_user(user_id)
+        else:
+            self.vector_db.delete_data(collection=collection, user_id=user_id)
+
+    def get_section_titles(self, collection: str, user_id: str) -> Set[str]:
+        """
+        Returns the headings of the sections of the user's document, e.g. the feature titles of a specification.
+
+        Args:
+            collection (str): The name of the vector database collection.
+            user_id (str): The unique identifier of the user.
+
+        Returns:
+            Set[str]: The headings, each also without its "Feature N:" prefix.
+        """
+        titles = set()
+        for meta in self.vector_db.get_metadata(collection=collection, user_id=user_id).values():
+            for title in meta.get("section_path", "").split(" > "):
+                titles.update({title, self.chunker.feature_pattern.sub("", title).strip()})
+        titles.discard("")
+        return titles
+
+    def delete_orphaned_data(self, has_session: Callable[[str], bool]) -> int:
+        """
+        Removes the documents of users who no longer have a session, e.g. persisted ones after a restart.
+
+        Args:
+            has_session (Callable[[str], bool]): Tells whether a user still has a session.
+
+        Returns:
+            int: The number of users whose documents were removed.
+        """
+        orphaned = [user_id for user_id in self.vector_db.get_user_ids() if not has_session(user_id)]
+        for user_id in orphaned:
+            self.vector_db.delete_user(user_id)
+        return len(orphaned)
 
     def embed_content(self, content: str | List[str], task_type: str) -> List[List[float]] | List[float]:
         """
@@ -79,10 +227,106 @@ class DocumentManager:
             List[str]: A list of found similar data.
         """
         query_embedding = self.embed_content(content=query, task_type='retrieval_query')
+        with trace_stage("search"):
+            return self._search(query, query_embedding, collection, user_id)
+
+    def find_similar_data_in_collections(self, query: str, collections: List[str],
+                                         user_id: str) -> Dict[str, List[str]]:
+        """
+        Searches several collections for data similar to the given query.
+
+        The query is embedded once and the collections are searched concurrently.
+
+        Args:
+            query (str): The search query text.
+            collections (List[str]): The names of the vector database collections.
+            user_id (str): The unique identifier of the user.
+
+        Returns:
+            Dict[str, List[str]]: The found similar data per collection.
+        """
+        query_embedding = self.embed_content(content=query, task_type='retrieval_query')
+        with trace_stage("search"):
+            results = list(self.search_executor.map(
+                lambda collection: self._search(query, query_embedding, collection, user_id), collections
+            ))
+        return dict(zip(collections, results))
+
+    def _search(self, query: str, query_embedding: List[float], collection: str, user_id: str) -> List[str]:
         metadata = {"user_id": user_id}
-        return self.vector_db.retrieve_relevant_data(
-            query_embedding=query_embedding, collection=collection, metadata=metadata
+        if self.reranker is None:
+            return self.vector_db.retrieve_relevant_data(
+                query_embedding=query_embedding, collection=collection, metadata=metadata,
+                distance_threshold=RETRIEVAL_DISTANCE_THRESHOLD, top_k=RETRIEVAL_TOP_K
+            )
+
+        # Re-rank a wider candidate set, then keep the top-k by fused score
+        candidates = self.vector_db.retrieve_scored_data(
+            query_embedding=query_embedding, collection=collection, metadata=metadata,
+            distance_threshold=RETRIEVAL_DISTANCE_THRESHOLD, top_k=RETRIEVAL_TOP_K * 3
         )
+        return [text for text, _ in self.reranker.rerank(query, candidates)[:RETRIEVAL_TOP_K]]
+
+    def _build_generation_inputs(self, relevant_specs: List[str], relevant_test_cases: List[str],
+                                 feature: str) -> Dict[str, str]:
+        """Packs the most relevant chunks into the context token budget, specification first."""
+        specs, used_tokens = self.context_packer.pack(relevant_specs,
+                                                      max_tokens=self.context_packer.max_tokens // 2)
+        test_cases, _ = self.context_packer.pack(relevant_test_cases,
+                                                 max_tokens=self.context_packer.max_tokens - used_tokens)
+        return {
+            "specification": '\n'.join(specs),
+            "test_cases": '\n'.join(test_cases),
+            "feature": feature
+        }
+
+    def _get_revisions(self, collections: List[str], user_id: str) -> Optional[Tuple[str, ...]]:
+        """Returns the revision of the user's document in each collection, or None if one is not loaded."""
+        revisions = []
+        for collection in collections:
+            metadata = self.vector_db.get_metadata(collection=collection, user_id=user_id)
+            revision_ids = {meta.get("revision_id") for meta in metadata.values()}
+            if len(revision_ids) != 1 or None in revision_ids:
+                return None
+            revisions.append(revision_ids.pop())
+        return tuple(revisions)
+
+    def get_cached_test_cases(self, feature: str, collections: List[str], user_id: str) -> Optional[str]:
+        """
+        Returns test cases generated earlier for the feature from the same document revisions.
+
+        Args:
+            feature (str): The feature name.
+            collections (List[str]): The collections of the documents the test cases are generated from.
+            user_id (str): The unique identifier of the user.
+
+        Returns:
+            Optional[str]: The cached test cases, or None.
+        """
+        revisions = self._get_revisions(collections, user_id) if self.response_cache else None
+        if revisions is None:
+            return None
+        embedding = (self.embed_content(content=feature, task_type='retrieval_query')
+                     if self.response_cache.similarity_threshold > 0 else None)
+        return self.response_cache.get(revisions, feature, self.llm_chains.test_case_template_hash(), embedding)
+
+    def cache_test_cases(self, feature: str, collections: List[str], user_id: str, test_cases: str) -> None:
+        """
+        Caches generated test cases for the feature and the current document revisions.
+
+        Args:
+            feature (str): The feature name.
+            collections (List[str]): The collections of the documents the test cases were generated from.
+            user_id (str): The unique identifier of the user.
+            test_cases (str): The generated test cases.
+        """
+        revisions = self._get_revisions(collections, user_id) if self.response_cache else None
+        if revisions is None or not test_cases:
+            return
+        # The query embedding is already in the embedding cache from the lookup and the retrieval
+        embedding = (self.embed_content(content=feature, task_type='retrieval_query')
+                     if self.response_cache.similarity_threshold > 0 else None)
+        self.response_cache.set(revisions, feature, self.llm_chains.test_case_template_hash(), test_cases, embedding)
 
     def generate_test_cases(self, relevant_specs: List[str], relevant_test_cases: List[str], feature: str) -> str:
         """
@@ -97,14 +341,27 @@ class DocumentManager:
             str: The generated test cases in text format, including appropriate HTML tags for formatting.
                  If no relevant test cases are found, an error message is returned.
         """
-        specification = '\n'.join(relevant_specs)
-        test_cases = '\n'.join(relevant_test_cases)
-
         chain = self.llm_chains.build_test_case_chain()
-        result = chain.invoke({
-            "specification": specification,
-            "test_cases": test_cases,
-            "feature": feature
-        })
+        with trace_stage("generate"):
+            result = chain.invoke(self._build_generation_inputs(relevant_specs, relevant_test_cases, feature))
 
         return result.content
+
+    def stream_test_cases(self, relevant_specs: List[str], relevant_test_cases: List[str],
+                          feature: str) -> Iterator[str]:
+        """
+        Generates test cases like `generate_test_cases`, but yields the text piece by piece as the LLM produces it.
+
+        Args:
+            relevant_specs (List[str]): A list of specification chunks related to the feature.
+            relevant_test_cases (List[str]): A list of existing test cases related to the feature.
+            feature (str): The specific feature for which test cases need to be generated.
+
+        Yields:
+            str: The next piece of the generated test cases.
+        """
+        chain = self.llm_chains.build_test_case_chain()
+        with trace_stage("generate"):
+            for chunk in chain.stream(self._build_generation_inputs(relevant_specs, relevant_test_cases, feature)):
+                if chunk.content:
+                    yield chunk.content
@@ -0,0 +1,162 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+from backend.app.job_store import IngestionJob, JobStore, InMemoryJobStore, RedisJobStore
+from backend.config import (INGESTION_MAX_WORKERS, INGESTION_JOB_RETENTION_SECONDS, INGESTION_JOB_BACKEND,
+                            INGESTION_LOCK_TIMEOUT_SECONDS, REDIS_URL)
+
+
+logger = logging.getLogger(__name__)
+
+
+def create_job_store() -> JobStore:
+    """Creates the job store selected by the INGESTION_JOB_BACKEND setting ("memory" or "redis")."""
+    if INGESTION_JOB_BACKEND == "redis":
+        return RedisJobStore(retention_seconds=INGESTION_JOB_RETENTION_SECONDS,
+                             lock_timeout=INGESTION_LOCK_TIMEOUT_SECONDS, url=REDIS_URL)
+    return InMemoryJobStore(retention_seconds=INGESTION_JOB_RETENTION_SECONDS)
+
+
+class IngestionJobQueue:
+    """
+    Runs document ingestion in a bounded pool of worker threads, so chat requests do not wait for it.
+
+    Each user has at most one job per collection: submitting a document for a collection cancels
+    the previous job of that collection. Jobs of the same user and collection run one after another,
+    so a cancelled job that is still running never writes after the job that replaced it.
+    The job state is kept in a JobStore: in process, or in Redis so that the jobs of all worker
+    processes can be queried, awaited and cancelled from any of them.
+    """
+
+    poll_interval = 0.2  # Seconds between status checks while waiting for jobs of other processes
+
+    def __init__(self, max_workers: int = INGESTION_MAX_WORKERS, store: Optional[JobStore] = None) -> None:
+        self.store = store or create_job_store()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        self._futures: Dict[str, Future] = {}  # Jobs queued or running in this process
+        self._lock = threading.Lock()
+
+    def submit(self, user_id: str, collection: str, doc_link: str, load: Callable[[IngestionJob], None],
+               on_complete: Callable[[IngestionJob], None],
+               on_discard: Callable[[IngestionJob], None]) -> IngestionJob:
+        """
+        Queues the ingestion of a document.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+            collection (str): The name of the vector database collection.
+            doc_link (str): The URL of the Google Document.
+            load (Callable[[IngestionJob], None]): Loads the document, reporting each finished stage to the job
+                                                   and stopping before it stores anything once the job is cancelled.
+            on_complete (Callable[[IngestionJob], None]): Called when the job completes or fails,
+                                                          unless it was cancelled meanwhile.
+            on_discard (Callable[[IngestionJob], None]): Called when a running job ends after its documents
+                                                         were discarded (see `cancel_user`), to remove
+                                                         whatever it stored.
+
+        Returns:
+            IngestionJob: The queued job.
+        """
+        job = IngestionJob(user_id, collection, doc_link, store=self.store)
+        self._cancel_futures(self.store.add(job))
+        with self._lock:
+            future = self._futures[job.id] = self._executor.submit(self._run, job, load, on_complete, on_discard)
+        future.add_done_callback(lambda _: self._forget(job.id))
+        return job
+
+    def _forget(self, job_id: str) -> None:
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _cancel_futures(self, job_ids: List[str]) -> None:
+        # Cancelled jobs that have not started yet need not wait for a worker thread
+        with self._lock:
+            futures = [self._futures[job_id] for job_id in job_ids if job_id in self._futures]
+        for future in futures:
+            future.cancel()
+
+    def _run(self, job: IngestionJob, load: Callable[[IngestionJob], None],
+             on_complete: Callable[[IngestionJob], None], on_discard: Callable[[IngestionJob], None]) -> None:
+        # Wait for a previous (cancelled) job of the same user and collection to finish storing
+        with self.store.partition_lock(job.user_id, job.collection):
+            if not self.store.start(job):
+                return
+            try:
+                load(job)
+            except Exception as e:
+                logger.exception("Failed to load %s document %s", job.collection, job.doc_link)
+                finished = self.store.finish(job, "failed", str(e))
+            else:
+                finished = self.store.finish(job, "completed")
+
+            if not finished:
+                # The job may have stored its chunks before it noticed the cancellation
+                if job.discarded:
+                    self._discard(job, on_discard)
+                return
+        on_complete(job)
+
+    @staticmethod
+    def _discard(job: IngestionJob, on_discard: Callable[[IngestionJob], None]) -> None:
+        try:
+            on_discard(job)
+        except Exception:
+            logger.exception("Failed to remove the cancelled %s document %s", job.collection, job.doc_link)
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.store.get(job_id)
+
+    def get_user_jobs(self, user_id: str) -> Dict[str, IngestionJob]:
+        """Returns the user's current job of each collection."""
+        return self.store.get_user_jobs(user_id)
+
+    def get_user_ids(self) -> List[str]:
+        """Returns the IDs of all users with current jobs."""
+        return self.store.get_user_ids()
+
+    def wait_for_user(self, user_id: str, timeout: Optional[float] = None,
+                      collections: Optional[List[str]] = None) -> List[IngestionJob]:
+        """
+        Blocks until the user's pending jobs have finished.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+            timeout (Optional[float]): The maximum time to wait in seconds.
+            collections (Optional[List[str]]): Only wait for the jobs of these collections. All if omitted.
+
+        Returns:
+            List[IngestionJob]: The user's failed jobs.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            jobs = [job for collection, job in self.get_user_jobs(user_id).items()
+                    if collections is None or collection in collections]
+            # Jobs of this process are awaited until their completion callback has run as well
+            with self._lock:
+                futures = {job.id: self._futures[job.id] for job in jobs
+                           if job.id in self._futures and not self._futures[job.id].done()}
+            pending = [job for job in jobs if job.id in futures or job.status in ("queued", "running")]
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if not pending or (remaining is not None and remaining <= 0):
+                return [job for job in jobs if job.status == "failed"]
+
+            if all(job.id in futures for job in pending):
+                wait(futures.values(), timeout=remaining)
+            else:
+                # Jobs of other processes are polled
+                time.sleep(self.poll_interval if remaining is None else min(self.poll_interval, remaining))
+
+    def cancel_user(self, user_id: str) -> None:
+        """
+        Cancels the user's jobs because the user's documents are discarded. Jobs that are already
+        running remove whatever they stored once they end.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+        """
+        self._cancel_futures(self.store.cancel_user(user_id))
+
+
+ingestion_jobs = IngestionJobQueue()
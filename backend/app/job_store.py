@@ -0,0 +1,395 @@
+import json
+import time
+import uuid
+import threading
+import redis
+from abc import ABC, abstractmethod
+from typing import Any, ContextManager, Dict, List, Optional, Tuple
+
+
+STAGES = ("fetched", "chunked", "embedded", "indexed")
+
+
+class IngestionJob:
+    """
+    A document being loaded into the vector database in the background.
+
+    `progress` holds the number of items (blocks or chunks) of each finished stage.
+    """
+
+    def __init__(self, user_id: str, collection: str, doc_link: str, store: "JobStore",
+                 job_id: Optional[str] = None) -> None:
+        self.id = job_id or uuid.uuid4().hex
+        self.user_id = user_id
+        self.collection = collection
+        self.doc_link = doc_link
+        self.status = "queued"  # queued -> running -> completed | failed; or cancelled
+        self.progress: Dict[str, Optional[int]] = {stage: None for stage in STAGES}
+        self.error: Optional[str] = None
+        self.finished_at: Optional[float] = None
+        self.discarded = False  # Whether the job's documents were discarded, so whatever it stored must be removed
+        self.store = store
+
+    def report(self, stage: str, count: int) -> None:
+        self.store.report(self, stage, count)
+
+    def is_cancelled(self) -> bool:
+        """Tells whether the job was cancelled; a running job checks it before storing anything."""
+        return self.store.is_cancelled(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "collection": self.collection,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error
+        }
+
+
+class JobStore(ABC):
+    """
+    State of the ingestion jobs shared by IngestionJobQueue.
+
+    Every status change is atomic, so a job that is cancelled while it starts or finishes ends up
+    either cancelled or finished, never both.
+    """
+
+    def __init__(self, retention_seconds: float) -> None:
+        self.retention_seconds = retention_seconds
+
+    @abstractmethod
+    def add(self, job: IngestionJob) -> List[str]:
+        """
+        Makes the job the user's current job of its collection, cancelling the previous one if it has not finished.
+
+        Args:
+            job (IngestionJob): The queued job.
+
+        Returns:
+            List[str]: The IDs of the cancelled jobs.
+        """
+
+    @abstractmethod
+    def start(self, job: IngestionJob) -> bool:
+        """Marks the job as running; returns False if it was cancelled meanwhile."""
+
+    @abstractmethod
+    def finish(self, job: IngestionJob, status: str, error: Optional[str] = None) -> bool:
+        """
+        Records that the job has completed or failed.
+
+        Args:
+            job (IngestionJob): The running job.
+            status (str): "completed" or "failed".
+            error (Optional[str]): The error message of a failed job.
+
+        Returns:
+            bool: False if the job was cancelled while it ran; `job.discarded` then tells whether
+                  whatever it stored must be removed.
+        """
+
+    @abstractmethod
+    def cancel_user(self, user_id: str) -> List[str]:
+        """
+        Forgets the user's jobs, cancelling and discarding those that have not finished.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+
+        Returns:
+            List[str]: The IDs of the cancelled jobs.
+        """
+
+    @abstractmethod
+    def report(self, job: IngestionJob, stage: str, count: int) -> None:
+        """Records the number of items of a finished stage."""
+
+    @abstractmethod
+    def is_cancelled(self, job: IngestionJob) -> bool:
+        """Tells whether the job was cancelled."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Returns the job, or None if it is unknown or expired."""
+
+    @abstractmethod
+    def get_user_jobs(self, user_id: str) -> Dict[str, IngestionJob]:
+        """Returns the user's current job of each collection."""
+
+    @abstractmethod
+    def get_user_ids(self) -> List[str]:
+        """Returns the IDs of all users with current jobs."""
+
+    @abstractmethod
+    def partition_lock(self, user_id: str, collection: str) -> ContextManager:
+        """Returns the lock that makes the jobs of the same user and collection run one after another."""
+
+
+class InMemoryJobStore(JobStore):
+    """In-process job store. Finished jobs are pruned `retention_seconds` after they end."""
+
+    def __init__(self, retention_seconds: float) -> None:
+        super().__init__(retention_seconds=retention_seconds)
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._user_jobs: Dict[str, Dict[str, IngestionJob]] = {}  # {user_id: {collection: job}}
+        self._partition_locks: Dict[Tuple[str, str], threading.Lock] = {}  # {(user_id, collection): lock}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cancel(job: IngestionJob, discard: bool = False) -> None:
+        # A queued job ends right away; a running job ends once it notices the cancellation
+        if job.status == "queued":
+            job.finished_at = time.time()
+        job.status = "cancelled"
+        job.discarded = discard
+
+    def _prune(self) -> None:
+        deadline = time.time() - self.retention_seconds
+        expired = [job for job in self._jobs.values() if job.finished_at and job.finished_at < deadline]
+        for job in expired:
+            del self._jobs[job.id]
+            user_jobs = self._user_jobs.get(job.user_id, {})
+            if user_jobs.get(job.collection) is job:
+                del user_jobs[job.collection]
+                if not user_jobs:
+                    del self._user_jobs[job.user_id]
+
+        # Locks of partitions without current jobs, unless a cancelled job still runs
+        for key, lock in list(self._partition_locks.items()):
+            user_id, collection = key
+            if collection not in self._user_jobs.get(user_id, {}) and not lock.locked():
+                del self._partition_locks[key]
+
+    def add(self, job: IngestionJob) -> List[str]:
+        with self._lock:
+            self._prune()
+            cancelled = []
+            previous = self._user_jobs.setdefault(job.user_id, {}).get(job.collection)
+            if previous and previous.status in ("queued", "running"):
+                self._cancel(previous)
+                cancelled.append(previous.id)
+            self._jobs[job.id] = job
+            self._user_jobs[job.user_id][job.collection] = job
+            self._partition_locks.setdefault((job.user_id, job.collection), threading.Lock())
+            return cancelled
+
+    def start(self, job: IngestionJob) -> bool:
+        with self._lock:
+            if job.status == "cancelled":
+                return False
+            job.status = "running"
+            return True
+
+    def finish(self, job: IngestionJob, status: str, error: Optional[str] = None) -> bool:
+        with self._lock:
+            job.finished_at = time.time()
+            if job.status == "cancelled":
+                return False
+            job.status, job.error = status, error
+            return True
+
+    def cancel_user(self, user_id: str) -> List[str]:
+        with self._lock:
+            cancelled = []
+            for job in self._user_jobs.pop(user_id, {}).values():
+                if job.status in ("queued", "running"):
+                    self._cancel(job, discard=True)
+                    cancelled.append(job.id)
+            return cancelled
+
+    def report(self, job: IngestionJob, stage: str, count: int) -> None:
+        job.progress[stage] = count
+
+    def is_cancelled(self, job: IngestionJob) -> bool:
+        return job.status == "cancelled"
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_user_jobs(self, user_id: str) -> Dict[str, IngestionJob]:
+        with self._lock:
+            return dict(self._user_jobs.get(user_id, {}))
+
+    def get_user_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._user_jobs)
+
+    def partition_lock(self, user_id: str, collection: str) -> ContextManager:
+        with self._lock:
+            return self._partition_locks.setdefault((user_id, collection), threading.Lock())
+
+
+# Cancels the job stored under `key` if it has not finished; shared by the scripts below
+_CANCEL_JOB = """
+local function cancel(key, discard, now)
+    local status = redis.call('HGET', key, 'status')
+    if status ~= 'queued' and status ~= 'running' then
+        return false
+    end
+    redis.call('HSET', key, 'status', 'cancelled', 'discarded', discard)
+    if status == 'queued' then
+        redis.call('HSET', key, 'finished_at', now)
+    end
+    return true
+end
+"""
+
+# KEYS: user's jobs, new job. ARGV: collection, job ID, job key prefix, now, TTL, job fields...
+_ADD_JOB = _CANCEL_JOB + """
+local cancelled = {}
+local previous = redis.call('HGET', KEYS[1], ARGV[1])
+if previous and cancel(ARGV[3] .. previous, '0', ARGV[4]) then
+    table.insert(cancelled, previous)
+end
+for i = 6, #ARGV, 2 do
+    redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return cancelled
+"""
+
+# KEYS: user's jobs. ARGV: job key prefix, now
+_CANCEL_USER = _CANCEL_JOB + """
+local cancelled = {}
+for _, job_id in ipairs(redis.call('HVALS', KEYS[1])) do
+    if cancel(ARGV[1] .. job_id, '1', ARGV[2]) then
+        table.insert(cancelled, job_id)
+    end
+end
+redis.call('DEL', KEYS[1])
+return cancelled
+"""
+
+# KEYS: job. ARGV: TTL
+_START_JOB = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'queued' then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'status', 'running')
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# KEYS: job. ARGV: status, error, now, TTL. Returns the final status and the discarded flag
+_FINISH_JOB = """
+local status = redis.call('HGET', KEYS[1], 'status')
+if not status then
+    return {ARGV[1], '0'}
+end
+redis.call('HSET', KEYS[1], 'finished_at', ARGV[3])
+if status ~= 'cancelled' then
+    redis.call('HSET', KEYS[1], 'status', ARGV[1], 'error', ARGV[2])
+    status = ARGV[1]
+end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {status, redis.call('HGET', KEYS[1], 'discarded')}
+"""
+
+
+class RedisJobStore(JobStore):
+    """
+    Job store in Redis (or any server speaking its protocol), so every worker process sees and can cancel
+    the jobs that the others run.
+
+    Each job is a hash that expires `retention_seconds` after its last change; status changes run as
+    Lua scripts. The partition lock is a Redis lock that expires after `lock_timeout` seconds, so a
+    crashed worker does not block the user's later jobs for good.
+    """
+
+    key_prefix = "chatbot:"
+
+    def __init__(self, retention_seconds: float, lock_timeout: float, url: Optional[str] = None,
+                 client: Optional[redis.Redis] = None) -> None:
+        super().__init__(retention_seconds=retention_seconds)
+        self.lock_timeout = lock_timeout
+        self.client = client or redis.Redis.from_url(url)
+        self._add_job = self.client.register_script(_ADD_JOB)
+        self._cancel_user = self.client.register_script(_CANCEL_USER)
+        self._start_job = self.client.register_script(_START_JOB)
+        self._finish_job = self.client.register_script(_FINISH_JOB)
+
+    @property
+    def _job_prefix(self) -> str:
+        return f"{self.key_prefix}job:"
+
+    def _user_key(self, user_id: str) -> str:
+        return f"{self.key_prefix}jobs:{user_id}"
+
+    def _from_record(self, job_id: str, record: Dict[bytes, bytes]) -> Optional[IngestionJob]:
+        record = {key.decode(): value.decode() for key, value in record.items()}
+        if "user_id" not in record:
+            return None
+        job = IngestionJob(record["user_id"], record["collection"], record["doc_link"], store=self, job_id=job_id)
+        job.status = record["status"]
+        job.progress = json.loads(record["progress"])
+        job.error = record["error"] or None
+        job.finished_at = float(record["finished_at"]) if record["finished_at"] else None
+        job.discarded = record["discarded"] == "1"
+        return job
+
+    def add(self, job: IngestionJob) -> List[str]:
+        record = {"user_id": job.user_id, "collection": job.collection, "doc_link": job.doc_link,
+                  "status": job.status, "progress": json.dumps(job.progress), "error": "", "finished_at": "",
+                  "discarded": "0"}
+        fields = [item for field in record.items() for item in field]
+        cancelled = self._add_job(keys=[self._user_key(job.user_id), self._job_prefix + job.id],
+                                  args=[job.collection, job.id, self._job_prefix, time.time(),
+                                        int(self.retention_seconds), *fields])
+        return [job_id.decode() for job_id in cancelled]
+
+    def start(self, job: IngestionJob) -> bool:
+        if not self._start_job(keys=[self._job_prefix + job.id], args=[int(self.retention_seconds)]):
+            job.status = "cancelled"
+            return False
+        job.status = "running"
+        return True
+
+    def finish(self, job: IngestionJob, status: str, error: Optional[str] = None) -> bool:
+        job.finished_at = time.time()
+        final_status, discarded = self._finish_job(keys=[self._job_prefix + job.id],
+                                                   args=[status, error or "", job.finished_at,
+                                                         int(self.retention_seconds)])
+        if final_status == b"cancelled":
+            job.status, job.discarded = "cancelled", discarded == b"1"
+            return False
+        job.status, job.error = status, error
+        return True
+
+    def cancel_user(self, user_id: str) -> List[str]:
+        cancelled = self._cancel_user(keys=[self._user_key(user_id)], args=[self._job_prefix, time.time()])
+        return [job_id.decode() for job_id in cancelled]
+
+    def report(self, job: IngestionJob, stage: str, count: int) -> None:
+        job.progress[stage] = count
+        key = self._job_prefix + job.id
+        pipeline = self.client.pipeline()
+        pipeline.hset(key, "progress", json.dumps(job.progress))
+        pipeline.expire(key, int(self.retention_seconds))
+        pipeline.execute()
+
+    def is_cancelled(self, job: IngestionJob) -> bool:
+        return self.client.hget(self._job_prefix + job.id, "status") == b"cancelled"
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self._from_record(job_id, self.client.hgetall(self._job_prefix + job_id))
+
+    def get_user_jobs(self, user_id: str) -> Dict[str, IngestionJob]:
+        job_ids = {collection.decode(): job_id.decode()
+                   for collection, job_id in self.client.hgetall(self._user_key(user_id)).items()}
+        pipeline = self.client.pipeline()
+        for job_id in job_ids.values():
+            pipeline.hgetall(self._job_prefix + job_id)
+        jobs = {collection: self._from_record(job_id, record)
+                for (collection, job_id), record in zip(job_ids.items(), pipeline.execute())}
+        return {collection: job for collection, job in jobs.items() if job is not None}
+
+    def get_user_ids(self) -> List[str]:
+        prefix = self._user_key("")
+        return [key.decode()[len(prefix):] for key in self.client.scan_iter(match=f"{prefix}*")]
+
+    def partition_lock(self, user_id: str, collection: str) -> ContextManager:
+        return self.client.lock(f"{self.key_prefix}job-lock:{user_id}:{collection}", timeout=self.lock_timeout)
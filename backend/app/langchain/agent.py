@@ -1,55 +1,82 @@
 from langchain.agents import AgentExecutor, StructuredChatAgent
 from langchain.prompts import MessagesPlaceholder
-from langchain.prompts.chat import ChatPromptTemplate
-from backend.app.langchain.tools import all_tools
-from backend.services.gemini_service import GeminiService
-from backend.app.memory_manager import ChatbotMemoryManager
+from backend.app.langchain.tools import COLLECTIONS, GENERATION_REQUESTED, all_tools
+from backend.app.container import services
+from backend.services.metrics import trace_stage
+from backend.config import LOG_LEVEL
 
 
-gemini_service = GeminiService()
-memory_manager = ChatbotMemoryManager()
+SYSTEM_PROMPT = (
+    "You are a helpful assistant guiding users through a multi-step task "
+    "(e.g., uploading and analyzing specification and test case documents). "
+    "The current step of the conversation and what the bot is expecting is:\n"
+    "{current_step}\n"
+    "Session state: documents loaded: {documents_loaded}; "
+    "specification document: {spec_doc_link}; test cases document: {test_cases_doc_link}; "
+    "feature: {feature}.\n"
+    "Do not make assumptions or respond without consulting this context. "
+    "If the context is ambiguous or if the user replies with a vague answer "
+    "(e.g., 'yes', '1', 'ok', or a document link), use the context to determine what was expected. "
+    "If the context shows a prompt like a list of options, "
+    "and the user responds with a number or partial phrase, match that to the expected option. "
+    "If the user says something unrelated to the current context or skips steps, "
+    "guide them gently back to the expected step. "
+    "Always interpret the user’s reply based on the current step. "
+    "If you need more information or context, ask for clarification."
+)
+CONTEXT_VARIABLES = ['current_step', 'documents_loaded', 'spec_doc_link', 'test_cases_doc_link', 'feature']
 
 
-def run_agent_with_tools(user_input: str, user_id: str) -> str:
-    memory = memory_manager.get_memory(user_id)
-
-    prompt = ChatPromptTemplate.from_messages([
-        ('system',
-         "You are a helpful assistant guiding users through a multi-step task "
-         "(e.g., uploading and analyzing specification and test case documents). "
-         "Before answering any message from the user, you must **always call the `check_current_context` tool** "
-         "to understand the current step of the conversation and what the bot is expecting. "
-         "Do not make assumptions or respond without consulting this context. "
-         "If the context is ambiguous or if the user replies with a vague answer "
-         "(e.g., 'yes', '1', 'ok', or a document link), use the context to determine what was expected. "
-         "If the context shows a prompt like a list of options, "
-         "and the user responds with a number or partial phrase, match that to the expected option. "
-         "If the user says something unrelated to the current context or skips steps, "
-         "guide them gently back to the expected step. "
-         "Always interpret the user’s reply based on the context returned by `check_current_context`. "
-         "If you need more information or context, ask for clarification."),
-        MessagesPlaceholder(variable_name='chat_history'),
-        ('human', '{input}')
-    ])
+def build_agent_executor() -> AgentExecutor:
+    """
+    Builds the agent executor shared by all requests (see `services.agent_executor`).
 
+    The executor holds no memory of its own: the user's chat history and session context
+    are passed in with every run.
+    """
     agent = StructuredChatAgent.from_llm_and_tools(
-        llm=gemini_service.langchain_model,
+        llm=services.gemini_service.langchain_model,
         tools=all_tools,
-        prompt=prompt
+        prefix=SYSTEM_PROMPT,
+        input_variables=['input', 'agent_scratchpad', 'chat_history', *CONTEXT_VARIABLES],
+        memory_prompts=[MessagesPlaceholder(variable_name='chat_history')]
     )
 
-    agent_executor = AgentExecutor(
+    return AgentExecutor(
         agent=agent,
-        llm=gemini_service.langchain_model,
         tools=all_tools,
-        memory=memory,
-        memory_key='chat_history',
-        verbose=True,
+        verbose=LOG_LEVEL == 'DEBUG',
         handle_parsing_errors=True
     )
 
+
+def get_prompt_context(user_id: str) -> dict:
+    """Renders the user's conversation step and session state as prompt variables."""
+    return {
+        'current_step': services.memory_manager.get_current_step(user_id),
+        'documents_loaded': 'yes' if services.memory_manager.is_documents_loaded(user_id, COLLECTIONS) else 'no',
+        'spec_doc_link': services.memory_manager.get_spec_doc_link(user_id) or 'not provided',
+        'test_cases_doc_link': services.memory_manager.get_test_cases_doc_link(user_id) or 'not provided',
+        'feature': services.memory_manager.get_feature(user_id) or 'not specified',
+    }
+
+
+def run_agent_with_tools(user_input: str, user_id: str) -> str:
+    memory = services.memory_manager.get_memory(user_id)
+    chat_history = memory.load_memory_variables({})['chat_history']
+
     # Add user_id to the input string
     user_input_with_id = f"(User ID: {user_id}) {user_input}"
-    response = agent_executor.run(user_input_with_id)
+    with trace_stage("agent"):
+        result = services.agent_executor.invoke({
+            'input': user_input_with_id,
+            'chat_history': chat_history,
+            **get_prompt_context(user_id)
+        })
+    response = result['output']
+
+    # A generation request is stored by the router together with the generated test cases
+    if response != GENERATION_REQUESTED:
+        services.memory_manager.store_message(user_id, user_input_with_id, response)
 
     return response
@@ -1,3 +1,5 @@
+import hashlib
+from typing import Optional
 from langchain.prompts import PromptTemplate
 from langchain_core.runnables import RunnableSequence
 from backend.services.gemini_service import GeminiService
@@ -6,9 +8,12 @@ from backend.config import PROJECT_ROOT
 
 class LLMChains:
 
-    def __init__(self):
-        gemini_service = GeminiService()
+    def __init__(self, gemini_service: Optional[GeminiService] = None):
+        gemini_service = gemini_service or GeminiService()
         self.llm = gemini_service.langchain_model
+        # Read once: the template hash is part of the key of every cached test case
+        self.test_case_template = self._get_prompt(prompt_file='generate_test_cases.txt')
+        self._test_case_template_hash = hashlib.sha256(self.test_case_template.encode('utf-8')).hexdigest()
 
     @staticmethod
     def _get_prompt(prompt_file):
@@ -17,10 +22,14 @@ class LLMChains:
             prompt = f.read()
         return prompt
 
+    def test_case_template_hash(self) -> str:
+        """Hash of the test case prompt template in use, so that cached test cases are not reused after it changes."""
+        return self._test_case_template_hash
+
     def build_test_case_chain(self) -> RunnableSequence:
         prompt = PromptTemplate(
             input_variables=['specification', 'test_cases', 'feature'],
-            template=self._get_prompt(prompt_file='generate_test_cases.txt'),
+            template=self.test_case_template,
         )
         return prompt | self.llm
 
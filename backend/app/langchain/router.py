@@ -0,0 +1,187 @@
+import re
+import json
+from typing import Callable, Iterator, List, Optional, Tuple
+from backend.app.langchain import tools
+from backend.app.langchain.agent import run_agent_with_tools
+from backend.app.container import services
+
+
+GOOGLE_DOC_LINK = re.compile(r"^https?://docs\.google\.com/document/d/[a-zA-Z0-9-_]+\S*$")
+MAX_FEATURE_NAME_LENGTH = 100
+FEATURE_REFERENCE = re.compile(r"^feature\s+\d+\b(:.*)?$", re.IGNORECASE)  # e.g. "Feature 3" or "Feature 3: Login"
+QUOTED_NAME = re.compile(r"^[\"'“‘](.+)[\"'”’]$")
+
+
+def _extract_doc_link(user_input: str) -> Optional[str]:
+    """Returns the message if it consists of a single Google Doc link."""
+    return user_input if GOOGLE_DOC_LINK.match(user_input) else None
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip(" \t.,;:!?").lower()
+
+
+def _match_feature_name(message: str, user_id: str) -> Optional[str]:
+    """
+    Returns the feature name that the message unambiguously refers to: an explicit "Feature N" or a quoted name,
+    or else a feature title or section heading of the user's specification once it has been loaded.
+    Any other message goes to the agent.
+    """
+    if not 0 < len(message) <= MAX_FEATURE_NAME_LENGTH or "\n" in message:
+        return None
+
+    quoted = QUOTED_NAME.match(message)
+    if quoted and quoted.group(1).strip():
+        return quoted.group(1).strip()
+    if FEATURE_REFERENCE.match(message):
+        return message
+
+    # Waiting for a specification that is still loading would hold up the reply; the agent answers meanwhile
+    if not services.memory_manager.is_documents_loaded(user_id, ['specification']):
+        return None
+    titles = services.document_manager.get_section_titles(collection='specification', user_id=user_id)
+    return message if _normalize(message) in {_normalize(title) for title in titles} else None
+
+
+def _match_menu_option(user_input: str) -> Optional[int]:
+    """Returns the index of the selected menu option, given by its number or its text."""
+    if user_input.isdigit() and 1 <= int(user_input) <= len(tools.MENU_OPTIONS):
+        return int(user_input) - 1
+
+    normalized = user_input.lower()
+    for i, option in enumerate(tools.MENU_OPTIONS):
+        option_text = option.split(" ", 1)[1].lower()  # Drop the leading emoji
+        if normalized in (option.lower(), option_text):
+            return i
+    return None
+
+
+def _extract_another_feature(user_id: str) -> str:
+    services.memory_manager.set_current_step(user_id, tools.STEP_AWAITING_FEATURE_NAME)
+    return "Specify the name of the feature for which you want to generate test cases."
+
+
+def _upload_new_documents(user_id: str) -> str:
+    tools.upload_new_documents(user_id)
+    return "Send a link to the Specification document."
+
+
+MENU_ACTIONS: List[Callable[[str], str]] = [_extract_another_feature, _upload_new_documents, tools.clear_session]
+
+
+def _feature_to_generate(message: str, user_id: str, step: str) -> Optional[str]:
+    """Returns the feature name if the message starts test case generation at the given step."""
+    if step == tools.STEP_AWAITING_FEATURE_NAME:
+        return _match_feature_name(message, user_id)
+    return None
+
+
+def _dispatch(message: str, user_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Handles the messages that the current step fully determines, except for the generation itself.
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: The response, or else the feature name to generate test cases for;
+                                             (None, None) if the message must be handled by the agent.
+    """
+    step = services.memory_manager.get_current_step(user_id)
+    feature_name = _feature_to_generate(message, user_id, step)
+    if feature_name is not None:
+        return None, feature_name
+
+    if step == tools.STEP_AWAITING_SPEC_DOC and _extract_doc_link(message):
+        return tools.load_specification_doc(user_id=user_id, doc_link=message), None
+    if step == tools.STEP_AWAITING_TEST_CASES_DOC and _extract_doc_link(message):
+        return tools.load_test_cases_doc(user_id=user_id, doc_link=message), None
+    if step == tools.STEP_AWAITING_MENU_OPTION:
+        option = _match_menu_option(message)
+        if option is not None:
+            return MENU_ACTIONS[option](user_id), None
+    return None, None
+
+
+def _remember(user_input: str, user_id: str, response: Optional[str]) -> Optional[str]:
+    # Keep the chat history complete for later turns handled by the agent
+    if response is not None:
+        services.memory_manager.store_message(user_id, f"(User ID: {user_id}) {user_input}", response)
+    return response
+
+
+def _answer(user_input: str, user_id: str) -> Tuple[Optional[str], bool]:
+    """
+    Handles the message up to test case generation: by the current step if it fully determines the message,
+    without a round trip to the LLM agent, and by the agent otherwise.
+
+    Returns:
+        Tuple[Optional[str], bool]: The response, or else (None, True) if test cases must be generated
+                                    for the user's feature.
+    """
+    response, feature_name = _dispatch(user_input.strip(), user_id)
+    if feature_name is not None:
+        tools.specify_feature_name(user_id=user_id, feature_name=feature_name)
+        return None, True
+    if response is not None:
+        return _remember(user_input, user_id, response), False
+
+    response = run_agent_with_tools(user_input=user_input, user_id=user_id)
+    if response == tools.GENERATION_REQUESTED:
+        return None, True
+    return response, False
+
+
+def to_response_dict(response: str) -> dict:
+    """Parses a JSON response ({response, menu, job_id, reset}); plain text becomes {"response": text}."""
+    try:
+        response_as_dict = json.loads(response)
+    except json.JSONDecodeError:
+        response_as_dict = None
+    return response_as_dict if isinstance(response_as_dict, dict) else {"response": response}
+
+
+def handle_message(user_input: str, user_id: str) -> str:
+    """
+    Answers a user's message.
+
+    Args:
+        user_input (str): The user's message.
+        user_id (str): The unique identifier of the user.
+
+    Returns:
+        str: The response, plain text or JSON.
+    """
+    response, generate = _answer(user_input, user_id)
+    if generate:
+        response = _remember(user_input, user_id, tools.generate_test_cases(user_id=user_id))
+    return response
+
+
+def _stream_generation(user_input: str, user_id: str) -> Iterator[Tuple[str, dict]]:
+    parts = []
+    for token in tools.stream_test_cases(user_id=user_id):
+        parts.append(token)
+        yield "token", {"text": token}
+
+    _remember(user_input, user_id, json.dumps({"response": "".join(parts), "menu": tools.MENU_OPTIONS}))
+    yield "done", {"menu": tools.MENU_OPTIONS}
+
+
+def stream_message(user_input: str, user_id: str) -> Iterator[Tuple[str, dict]]:
+    """
+    Streaming variant of `handle_message`.
+
+    Args:
+        user_input (str): The user's message.
+        user_id (str): The unique identifier of the user.
+
+    Returns:
+        Iterator[Tuple[str, dict]]: ("token", {text}) events followed by a ("done", {menu/reset metadata}) event.
+                                    Generated test cases arrive piece by piece; any other response as a single token.
+    """
+    response, generate = _answer(user_input, user_id)
+    if generate:
+        yield from _stream_generation(user_input, user_id)
+        return
+
+    response_dict = to_response_dict(response)
+    yield "token", {"text": response_dict.pop("response", "")}
+    yield "done", response_dict
@@ -1,14 +1,19 @@
 import json
+from typing import Iterator, List, Tuple
 from pydantic import BaseModel, Field
 from langchain.tools import StructuredTool
-from backend.app.document_manager import DocumentManager
-from backend.app.langchain.chains import LLMChains
-from backend.app.memory_manager import ChatbotMemoryManager
+from backend.app.container import services
+from backend.app.ingestion_jobs import IngestionJob, ingestion_jobs
 
 
-memory_manager = ChatbotMemoryManager()
-document_manager = DocumentManager()
-llm_chains = LLMChains()
+# === Conversation steps and menu ===
+STEP_AWAITING_SPEC_DOC = "Awaiting for a link to Specification document"
+STEP_AWAITING_TEST_CASES_DOC = "Awaiting for a link to Test Cases document."
+STEP_AWAITING_FEATURE_NAME = "Awaiting for specifying a feature name."
+STEP_AWAITING_GENERATION = "Awaiting for generating test cases."
+
+MENU_OPTIONS = ["🔄 Extract another feature", "📄 Upload new documents", "❌ End session"]
+STEP_AWAITING_MENU_OPTION = f"Awaiting for user to select one of the menu options: {MENU_OPTIONS}"
 
 
 class UploadDocInput(BaseModel):
@@ -25,17 +30,42 @@ class UserIDInput(BaseModel):
     user_id: str = Field(description="Unique identifier for the user")
 
 
+# === Background loading of documents ===
+COLLECTIONS = ['specification', 'test_cases']
+
+
+def _ingestion_finished(job: IngestionJob) -> None:
+    if job.status == "completed":
+        services.memory_manager.set_document_loaded(job.user_id, job.collection, True)
+
+
+def _ingestion_discarded(job: IngestionJob) -> None:
+    services.document_manager.delete_user_data(job.user_id, collection=job.collection)
+
+
+def _submit_document(user_id: str, doc_link: str, collection: str) -> IngestionJob:
+    services.memory_manager.set_document_loaded(user_id, collection, False)
+    return ingestion_jobs.submit(
+        user_id=user_id, collection=collection, doc_link=doc_link,
+        load=lambda job: services.document_manager.load_and_store_document(
+            doc_link=doc_link, collection=collection, user_id=user_id,
+            on_progress=job.report, is_cancelled=job.is_cancelled
+        ),
+        on_complete=_ingestion_finished,
+        on_discard=_ingestion_discarded
+    )
+
+
 # === Tool 1: Load Specification document ===
 def load_specification_doc(user_id: str, doc_link: str) -> str:
-    document_manager.load_and_store_document(doc_link=doc_link,
-                                             collection='specification',
-                                             user_id=user_id)
-
-    memory_manager.set_spec_doc_link(user_id, doc_link)
-    memory_manager.set_current_step(user_id, "Awaiting for a link to Test Cases document.")
+    job = _submit_document(user_id, doc_link, collection='specification')
+    services.memory_manager.set_spec_doc_link(user_id, doc_link)
+    services.memory_manager.set_current_step(user_id, STEP_AWAITING_TEST_CASES_DOC)
 
-    return (f"✅ Specification document has been loaded successfully.\n"
-            f"Now, send a link to the Test Cases document.")
+    return (json.dumps({
+        "response": "⏳ Specification document is being loaded.\nMeanwhile, send a link to the Test Cases document.",
+        "job_id": job.id
+    }))
 
 
 load_specification_doc_tool = StructuredTool.from_function(
@@ -49,18 +79,15 @@ load_specification_doc_tool = StructuredTool.from_function(
 
 # === Tool 2: Load Test Cases document ===
 def load_test_cases_doc(user_id: str, doc_link: str) -> str:
-    document_manager.load_and_store_document(doc_link=doc_link,
-                                             collection='test_cases',
-                                             user_id=user_id)
+    job = _submit_document(user_id, doc_link, collection='test_cases')
+    services.memory_manager.set_test_cases_doc_link(user_id, doc_link)
+    services.memory_manager.set_current_step(user_id, STEP_AWAITING_FEATURE_NAME)
 
-    memory_manager.set_test_cases_doc_link(user_id, doc_link)
-
-    memory_manager.set_current_step(user_id, "Provide feature name")
-    memory_manager.set_documents_loaded(user_id, True)
-    memory_manager.set_current_step(user_id, "Awaiting for specifying a feature name.")
-
-    return (f"✅ Test Cases document has been loaded successfully.\n"
-            f"Now, specify the name of the feature for which you want to generate test cases.")
+    return (json.dumps({
+        "response": ("⏳ Test Cases document is being loaded.\n"
+                     "Meanwhile, specify the name of the feature for which you want to generate test cases."),
+        "job_id": job.id
+    }))
 
 
 load_test_cases_doc_tool = StructuredTool.from_function(
@@ -74,10 +101,10 @@ load_test_cases_doc_tool = StructuredTool.from_function(
 
 # === Tool 3: Specify feature name ===
 def specify_feature_name(user_id: str, feature_name: str) -> str:
-    memory_manager.set_feature(user_id, feature_name)
-    memory_manager.set_current_step(user_id, "Awaiting for generating test cases.")
+    services.memory_manager.set_feature(user_id, feature_name)
+    services.memory_manager.set_current_step(user_id, STEP_AWAITING_GENERATION)
 
-    return 'Awaiting for generating test cases.'
+    return STEP_AWAITING_GENERATION
 
 
 specify_feature_name_tool = StructuredTool.from_function(
@@ -89,31 +116,81 @@ specify_feature_name_tool = StructuredTool.from_function(
 
 
 # === Tool 4: Generate Test Cases ===
-def generate_test_cases(user_id: str) -> str:
-    feature_name = memory_manager.get_feature(user_id)
-    relevant_specs = document_manager.find_similar_data_to_query(query=feature_name,
-                                                                 collection='specification',
-                                                                 user_id=user_id)
-    relevant_test_cases = document_manager.find_similar_data_to_query(query=feature_name,
-                                                                      collection='test_cases',
-                                                                      user_id=user_id)
-    test_cases = document_manager.generate_test_cases(relevant_specs=relevant_specs,
-                                                      relevant_test_cases=relevant_test_cases,
-                                                      feature=feature_name)
+def _find_relevant_data(user_id: str, feature_name: str) -> Tuple[List[str], List[str]]:
+    relevant_data = services.document_manager.find_similar_data_in_collections(
+        query=feature_name, collections=COLLECTIONS, user_id=user_id
+    )
+    return relevant_data['specification'], relevant_data['test_cases']
+
+
+def _loading_failed(user_id: str, failed_jobs: List[IngestionJob]) -> str:
+    services.memory_manager.set_current_step(user_id, STEP_AWAITING_MENU_OPTION)
+
+    errors = "\n".join(f"{job.collection}: {job.error}" for job in failed_jobs)
+    return f"❌ Loading the documents failed, please upload them again.\n{errors}"
 
-    menu = ["🔄 Extract another feature", "📄 Upload new documents", "❌ End session"]
 
-    memory_manager.set_current_step(user_id, f"Awaiting for user to select one of the menu options: {menu}")
+def _test_cases_generated(user_id: str, test_cases: str) -> str:
+    services.memory_manager.set_current_step(user_id, STEP_AWAITING_MENU_OPTION)
 
     return (json.dumps({
         "response": test_cases,
-        "menu": ["🔄 Extract another feature", "📄 Upload new documents", "❌ End session"]
+        "menu": MENU_OPTIONS
     }))
 
 
+def generate_test_cases(user_id: str) -> str:
+    # Generation needs both documents, which may still be loading
+    failed_jobs = ingestion_jobs.wait_for_user(user_id)
+    if failed_jobs:
+        return json.dumps({"response": _loading_failed(user_id, failed_jobs), "menu": MENU_OPTIONS})
+
+    feature_name = services.memory_manager.get_feature(user_id)
+    test_cases = services.document_manager.get_cached_test_cases(feature_name, COLLECTIONS, user_id)
+    if test_cases is None:
+        relevant_specs, relevant_test_cases = _find_relevant_data(user_id, feature_name)
+        test_cases = services.document_manager.generate_test_cases(relevant_specs=relevant_specs,
+                                                                   relevant_test_cases=relevant_test_cases,
+                                                                   feature=feature_name)
+        services.document_manager.cache_test_cases(feature_name, COLLECTIONS, user_id, test_cases)
+    return _test_cases_generated(user_id, test_cases)
+
+
+def stream_test_cases(user_id: str) -> Iterator[str]:
+    """Streaming variant of `generate_test_cases`: yields the generated test cases piece by piece."""
+    failed_jobs = ingestion_jobs.wait_for_user(user_id)
+    if failed_jobs:
+        yield _loading_failed(user_id, failed_jobs)
+        return
+
+    feature_name = services.memory_manager.get_feature(user_id)
+    test_cases = services.document_manager.get_cached_test_cases(feature_name, COLLECTIONS, user_id)
+    if test_cases is not None:
+        yield test_cases
+    else:
+        relevant_specs, relevant_test_cases = _find_relevant_data(user_id, feature_name)
+        parts = []
+        for part in services.document_manager.stream_test_cases(relevant_specs=relevant_specs,
+                                                                relevant_test_cases=relevant_test_cases,
+                                                                feature=feature_name):
+            parts.append(part)
+            yield part
+        services.document_manager.cache_test_cases(feature_name, COLLECTIONS, user_id, "".join(parts))
+
+    services.memory_manager.set_current_step(user_id, STEP_AWAITING_MENU_OPTION)
+
+
+# The agent only requests the generation: the router runs it, so /chat/stream can stream the test cases
+GENERATION_REQUESTED = "__generate_test_cases__"
+
+
+def request_test_cases(user_id: str) -> str:
+    return GENERATION_REQUESTED
+
+
 generate_test_cases_tool = StructuredTool.from_function(
     name="Generate Test Cases",
-    func=generate_test_cases,
+    func=request_test_cases,
     description="Use this tool to generate test cases.",
     args_schema=UserIDInput,
     return_direct=True
@@ -122,7 +199,7 @@ generate_test_cases_tool = StructuredTool.from_function(
 
 # === Tool 5: Fetch Chat History ===
 def fetch_chat_history(user_id: str):
-    memory = memory_manager.get_memory(user_id)
+    memory = services.memory_manager.get_memory(user_id)
     memory_vars = memory.load_memory_variables({})
     chat_history = memory_vars.get('chat_history', [])
     history_text = ""
@@ -145,34 +222,12 @@ check_chat_history_tool = StructuredTool.from_function(
 )
 
 
-# === Tool 6: Check the current context ===
-def check_current_context(user_id: str):
-    context = memory_manager.get_current_step(user_id)
-
-    return context
-
-
-check_current_context_tool = StructuredTool.from_function(
-    name="Check the current context",
-    description=(
-        "**ALWAYS** use this tool before responding to the user. "
-        "It returns the current dialogue context for a specific user based on what the bot expects next. "
-        "The result might be a short instruction or a multi-line message with specific prompts. "
-        "Use this tool to:\n"
-        "- Understand what step the user is currently on\n"
-        "- Interpret ambiguous replies (e.g., '1', 'yes', 'this one')\n"
-        "- Determine what kind of response or document link the user is expected to provide\n"
-        "This tool must be called for **EVERY** user message before generating any reply or deciding on next actions."
-    ),
-    func=check_current_context,
-    args_schema=UserIDInput
-)
-
-
-# === Tool 7: Upload new documents ===
+# === Tool 6: Upload new documents ===
 def upload_new_documents(user_id: str) -> str:
-    memory_manager.clear_context(user_id)
-    memory_manager.set_current_step(user_id, "Awaiting for a link to Specification document")
+    ingestion_jobs.cancel_user(user_id)
+    services.document_manager.delete_user_data(user_id)
+    services.memory_manager.clear_context(user_id)
+    services.memory_manager.set_current_step(user_id, STEP_AWAITING_SPEC_DOC)
 
     return "User wants to upload new documents. Awaiting for a link to Specification document"
 
@@ -185,10 +240,12 @@ upload_new_documents_tool = StructuredTool.from_function(
 )
 
 
-# === Tool 8: Upload new documents ===
+# === Tool 7: Clear user session ===
 def clear_session(user_id: str) -> str:
-    memory_manager.clear_session(user_id)
-    memory_manager.set_current_step(user_id, "Awaiting for a link to Specification document")
+    ingestion_jobs.cancel_user(user_id)
+    services.document_manager.delete_user_data(user_id)
+    services.memory_manager.clear_session(user_id)
+    services.memory_manager.set_current_step(user_id, STEP_AWAITING_SPEC_DOC)
 
     return (json.dumps({
         "response": "The user's session has been cleared.",
@@ -211,7 +268,6 @@ all_tools = [
     specify_feature_name_tool,
     generate_test_cases_tool,
     check_chat_history_tool,
-    check_current_context_tool,
     upload_new_documents_tool,
     clear_session_tool
 ]
@@ -1,16 +1,39 @@
-from typing import Optional, Dict, Any
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable, List
 from langchain.memory import ConversationBufferMemory
-from backend.services.gemini_service import GeminiService
+from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, messages_from_dict, messages_to_dict
+from backend.app.container import services
+from backend.app.session_store import SessionBackend, InMemorySessionBackend, RedisSessionBackend
+from backend.config import (SESSION_BACKEND, REDIS_URL, SESSION_TTL_SECONDS, SESSION_MAX_COUNT, SESSION_MAX_BYTES,
+                            MEMORY_MODE, MEMORY_RECENT_TURNS)
 
 
-gemini_service = GeminiService()
+logger = logging.getLogger(__name__)
+
+
+def create_session_backend() -> SessionBackend:
+    """Creates the session backend selected by the SESSION_BACKEND setting ("memory" or "redis")."""
+    if SESSION_BACKEND == "redis":
+        return RedisSessionBackend(ttl_seconds=SESSION_TTL_SECONDS, max_session_bytes=SESSION_MAX_BYTES,
+                                   url=REDIS_URL)
+    return InMemorySessionBackend(ttl_seconds=SESSION_TTL_SECONDS, max_sessions=SESSION_MAX_COUNT,
+                                  max_session_bytes=SESSION_MAX_BYTES)
 
 
 class ChatbotMemoryManager:
     """
     Manages both user-specific chat history (via LangChain) and context variables
-    (like links, flags, etc.) using a separate in-memory store.
+    (like links, flags, etc.) in a session store.
     Also tracks the current step in the user conversation flow.
+
+    Sessions are held in a pluggable SessionBackend: in process, with idle expiry, LRU eviction
+    and a per-session byte budget, or in Redis so that all worker processes share them and they survive restarts.
+
+    In "summary" memory mode only the last `recent_turns` turns are kept verbatim; older turns are
+    rolled into a running summary by the summarization chain in a background thread.
     """
     _instance = None
 
@@ -19,39 +42,114 @@ class ChatbotMemoryManager:
             cls._instance = super(ChatbotMemoryManager, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self):
-        self.user_memories: Dict[str, ConversationBufferMemory] = {}
-        self.user_contexts: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, session_store: Optional[SessionBackend] = None, memory_mode: str = MEMORY_MODE,
+                 recent_turns: int = MEMORY_RECENT_TURNS):
+        # The singleton is instantiated in several modules; only the first call initializes it
+        if getattr(self, "session_store", None) is not None:
+            return
+        self.session_store = session_store or create_session_backend()
+        self.memory_mode = memory_mode
+        self.recent_turns = recent_turns
+
+        self._summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+        self._pending_summaries = set()
+        self._summary_lock = threading.Lock()
+
+    def add_eviction_listener(self, listener: Callable[[str], None]) -> None:
+        """Registers a callable that is invoked with the user ID of each evicted session."""
+        self.session_store.add_eviction_listener(listener)
 
     def get_memory(self, user_id: str) -> ConversationBufferMemory:
-        if user_id not in self.user_memories:
-            self.user_memories[user_id] = ConversationBufferMemory(
-                memory_key="chat_history", return_messages=True
-            )
-        return self.user_memories[user_id]
+        """Returns a snapshot of the user's chat history; add messages with `store_message`."""
+        session = self.session_store.get(user_id) or {}
+        history = messages_from_dict(session.get("history", []))
+        if session.get("summary"):
+            history.insert(0, SystemMessage(content=f"Summary of the earlier conversation:\n{session['summary']}"))
+        return ConversationBufferMemory(
+            chat_memory=ChatMessageHistory(messages=history), memory_key="chat_history", return_messages=True
+        )
 
     def store_message(self, user_id: str, user_message: str, ai_message: str) -> None:
-        memory = self.get_memory(user_id)
-        memory.save_context({"input": user_message}, {"output": ai_message})
+        session = self.session_store.get_or_create(user_id)
+        session["history"].extend(messages_to_dict([HumanMessage(content=user_message),
+                                                    AIMessage(content=ai_message)]))
+        self.session_store.save(user_id, session)
+
+        # Summarize once the history holds twice as many turns as are kept verbatim
+        if self.memory_mode == "summary" and len(session["history"]) >= 4 * self.recent_turns:
+            self._schedule_summary(user_id)
+
+    # --- Running summary of older turns ---
+    def _schedule_summary(self, user_id: str) -> None:
+        with self._summary_lock:
+            if user_id in self._pending_summaries:
+                return
+            self._pending_summaries.add(user_id)
+        self._summary_executor.submit(self._summarize, user_id)
+
+    def _summarize(self, user_id: str) -> None:
+        try:
+            session = self.session_store.get(user_id)
+            if not session:
+                return
+            older_messages = session["history"][:-2 * self.recent_turns]
+            if not older_messages:
+                return
+
+            summary = self._build_summary(session.get("summary", ""), older_messages)
+
+            # Fold the summarized messages in, unless the history changed meanwhile (e.g. was cleared)
+            session = self.session_store.get(user_id)
+            if session and session["history"][:len(older_messages)] == older_messages:
+                session["history"] = session["history"][len(older_messages):]
+                session["summary"] = summary
+                self.session_store.save(user_id, session)
+        except Exception:
+            logger.exception("Failed to summarize the chat history of user %s", user_id)
+        finally:
+            with self._summary_lock:
+                self._pending_summaries.discard(user_id)
+
+    def _build_summary(self, previous_summary: str, messages: List[dict]) -> str:
+        lines = [f"Summary of the earlier conversation:\n{previous_summary}"] if previous_summary else []
+        for message in messages_from_dict(messages):
+            role = "User" if message.type == "human" else "Assistant"
+            lines.append(f"{role}: {message.content}")
+
+        chain = services.llm_chains.summarization_chain()
+        return chain.invoke({"content": "\n".join(lines)}).content
 
     # --- Context Storage: key-value per user ---
     def set_context(self, user_id: str, key: str, value: Any) -> None:
-        if user_id not in self.user_contexts:
-            self.user_contexts[user_id] = {}
-        self.user_contexts[user_id][key] = value
+        session = self.session_store.get_or_create(user_id)
+        session["context"][key] = value
+        self.session_store.save(user_id, session)
 
     def get_context(self, user_id: str, key: str) -> Any:
-        return self.user_contexts.get(user_id, {}).get(key, "")
+        return self.get_session(user_id).get(key, "")
 
     def clear_memory(self, user_id: str) -> None:
-        self.user_memories.pop(user_id, None)
+        session = self.session_store.get(user_id)
+        if session:
+            session["history"] = []
+            session.pop("summary", None)
+            self.session_store.save(user_id, session)
 
     def clear_context(self, user_id: str) -> None:
-        self.user_contexts.pop(user_id, None)
+        session = self.session_store.get(user_id)
+        if session:
+            session["context"] = {}
+            self.session_store.save(user_id, session)
 
     def clear_session(self, user_id: str) -> None:
-        self.clear_memory(user_id)
-        self.user_contexts.pop(user_id, None)
+        self.session_store.delete(user_id)
+
+    def has_session(self, user_id: str) -> bool:
+        return self.session_store.exists(user_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of live sessions and the bytes they hold."""
+        return self.session_store.stats()
 
     # --- Conversation Flow Tracking ---
     def set_current_step(self, user_id: str, step: str) -> None:
@@ -80,11 +178,14 @@ class ChatbotMemoryManager:
     def get_feature(self, user_id: str) -> str:
         return self.get_context(user_id, "feature") or ""
 
-    def set_documents_loaded(self, user_id: str, loaded: bool) -> None:
-        self.set_context(user_id, "documents_loaded", loaded)
+    def set_document_loaded(self, user_id: str, collection: str, loaded: bool) -> None:
+        """Records whether the user's document of the collection has been stored in the vector database."""
+        self.set_context(user_id, f"{collection}_loaded", loaded)
 
-    def is_documents_loaded(self, user_id: str) -> bool:
-        return bool(self.get_context(user_id, "documents_loaded"))
+    def is_documents_loaded(self, user_id: str, collections: List[str]) -> bool:
+        context = self.get_session(user_id)
+        return all(context.get(f"{collection}_loaded") for collection in collections)
 
     def get_session(self, user_id: str) -> Dict[str, Any]:
-        return self.user_contexts.get(user_id, {})
+        session = self.session_store.get(user_id)
+        return session["context"] if session else {}
@@ -1,16 +1,43 @@
 import json
-from flask import Blueprint, request, jsonify, render_template
-from backend.app.document_manager import DocumentManager
-from backend.app.langchain.agent import run_agent_with_tools
-from backend.app.memory_manager import ChatbotMemoryManager
+import time
+from flask import Blueprint, Response, request, jsonify, render_template, stream_with_context, g
+from backend.app.ingestion_jobs import ingestion_jobs
+from backend.services.metrics import (REQUEST_LATENCY, start_request_timing, request_timings, server_timing_header,
+                                      export_metrics)
+from backend.config import SERVER_TIMING_ENABLED
 
 
-memory_manager = ChatbotMemoryManager()
-document_manager = DocumentManager()
-
 chat_bp = Blueprint("chat", __name__)
 
 
+@chat_bp.before_request
+def start_timing():
+    g.request_start = time.perf_counter()
+    start_request_timing()
+
+
+@chat_bp.after_request
+def record_timing(response: Response) -> Response:
+    """Records the request latency and, if enabled, adds its per-stage breakdown as a Server-Timing header."""
+    elapsed = time.perf_counter() - g.request_start
+    REQUEST_LATENCY.labels(request.endpoint or "unknown").observe(elapsed)
+    if SERVER_TIMING_ENABLED:
+        timings = {**request_timings(), "total": elapsed}
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+
+# The chat modules are imported on first use: they pull in LangChain and the API clients
+def _get_response(user_message: str, user_id: str) -> dict:
+    from backend.app.langchain.router import handle_message, to_response_dict
+
+    return to_response_dict(handle_message(user_input=user_message, user_id=user_id))
+
+
+def _format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @chat_bp.route("/", methods=["GET"])
 def home():
     return render_template("index.html")
@@ -23,9 +50,42 @@ def chat():
     user_id = data.get("user_id")
     user_message = data.get("message")
 
-    response = run_agent_with_tools(user_input=user_message, user_id=user_id)
-    try:
-        response_as_dict = json.loads(response)
-        return response_as_dict
-    except json.JSONDecodeError:
-        return jsonify({"response": response})
+    return jsonify(_get_response(user_message, user_id))
+
+
+@chat_bp.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """
+    Handles chatbot interactions, sending the response as Server-Sent Events.
+
+    Generated test cases arrive as a series of "token" events; any other response is sent as a single one.
+    A final "done" event carries the menu/reset metadata.
+    """
+    data = request.get_json()
+    user_id = data.get("user_id")
+    user_message = data.get("message")
+
+    def generate_events():
+        from backend.app.langchain.router import stream_message
+
+        for event, event_data in stream_message(user_input=user_message, user_id=user_id):
+            yield _format_sse(event, event_data)
+
+    return Response(stream_with_context(generate_events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@chat_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    """Returns the status and per-stage progress of a document loading job."""
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@chat_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """Exposes request, stage and LLM metrics in the Prometheus text format."""
+    data, content_type = export_metrics()
+    return Response(data, content_type=content_type)
@@ -0,0 +1,254 @@
+import json
+import time
+import zlib
+import threading
+import redis
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+Session = Dict[str, Any]  # {"context": {key: value}, "history": [message dicts]}
+
+
+def _serialize(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _trim_history(session: Session, max_bytes: int) -> int:
+    """Drops the oldest chat messages until the session fits into max_bytes; returns its size."""
+    size = len(_serialize(session))
+    history = session["history"]
+    while size > max_bytes and history:
+        size -= len(_serialize(history.pop(0)))
+    return size
+
+
+class SessionBackend(ABC):
+    """
+    Storage of user sessions shared by ChatbotMemoryManager.
+
+    Listeners registered with `add_eviction_listener` are called with the user ID of every
+    session the backend evicts, so other per-user resources can be released as well.
+    """
+
+    def __init__(self, ttl_seconds: float, max_session_bytes: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_session_bytes = max_session_bytes
+        self._eviction_listeners: List[Callable[[str], None]] = []
+
+    def add_eviction_listener(self, listener: Callable[[str], None]) -> None:
+        """Registers a callable that is invoked with the user ID of each evicted session."""
+        self._eviction_listeners.append(listener)
+
+    def _notify_evicted(self, user_id: str) -> None:
+        for listener in self._eviction_listeners:
+            listener(user_id)
+
+    @abstractmethod
+    def get(self, user_id: str) -> Optional[Session]:
+        """
+        Returns the user's session, or None if there is none.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+
+        Returns:
+            Optional[Session]: The session.
+        """
+
+    @abstractmethod
+    def save(self, user_id: str, session: Session) -> None:
+        """
+        Stores the user's session, trimming its chat history to the byte budget.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+            session (Session): The session.
+        """
+
+    @abstractmethod
+    def exists(self, user_id: str) -> bool:
+        """
+        Tells whether the user has a session, without refreshing its expiry.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+
+        Returns:
+            bool: Whether the session exists.
+        """
+
+    @abstractmethod
+    def delete(self, user_id: str) -> None:
+        """
+        Deletes the user's session.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of live sessions and the bytes they hold."""
+
+    def get_or_create(self, user_id: str) -> Session:
+        """
+        Returns the user's session, creating an empty one if needed.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+
+        Returns:
+            Session: The session.
+        """
+        session = self.get(user_id)
+        if session is None:
+            session = {"context": {}, "history": []}
+            self.save(user_id, session)
+        return session
+
+
+class InMemorySessionBackend(SessionBackend):
+    """
+    In-process session store with bounded memory.
+
+    - Sessions idle for longer than the TTL are evicted.
+    - When more than `max_sessions` sessions exist, the least recently used ones are evicted.
+    - Each session is kept within `max_session_bytes` by dropping its oldest chat messages.
+    """
+
+    def __init__(self, ttl_seconds: float, max_sessions: int, max_session_bytes: int) -> None:
+        super().__init__(ttl_seconds=ttl_seconds, max_session_bytes=max_session_bytes)
+        self.max_sessions = max_sessions
+
+        self._sessions: OrderedDict[str, Session] = OrderedDict()  # least recently used first
+        self._last_access: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._evicted: List[str] = []  # Evicted sessions whose listeners have not been notified yet
+        self._lock = threading.Lock()
+
+    def _evict(self, user_id: str) -> None:
+        self._remove(user_id)
+        # Listeners may do slow cleanup (e.g. delete files), so they are notified once the lock is released
+        self._evicted.append(user_id)
+
+    def _notify_pending(self) -> None:
+        with self._lock:
+            evicted, self._evicted = self._evicted, []
+        for user_id in evicted:
+            self._notify_evicted(user_id)
+
+    def _remove(self, user_id: str) -> None:
+        self._sessions.pop(user_id, None)
+        self._last_access.pop(user_id, None)
+        self._sizes.pop(user_id, None)
+
+    def _evict_expired(self) -> None:
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            oldest = next(iter(self._sessions))
+            if self._last_access[oldest] >= deadline:
+                break
+            self._evict(oldest)
+
+    def _touch(self, user_id: str) -> None:
+        self._sessions.move_to_end(user_id)
+        self._last_access[user_id] = time.monotonic()
+
+    def _get(self, user_id: str) -> Optional[Session]:
+        self._evict_expired()
+        if user_id not in self._sessions:
+            return None
+        self._touch(user_id)
+        return self._sessions[user_id]
+
+    def _save(self, user_id: str, session: Session) -> None:
+        self._sessions[user_id] = session
+        self._sizes[user_id] = _trim_history(session, self.max_session_bytes)
+        self._touch(user_id)
+
+        while len(self._sessions) > self.max_sessions:
+            self._evict(next(iter(self._sessions)))
+
+    def get(self, user_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._get(user_id)
+        self._notify_pending()
+        return session
+
+    def get_or_create(self, user_id: str) -> Session:
+        with self._lock:
+            session = self._get(user_id)
+            if session is None:
+                session = {"context": {}, "history": []}
+                self._save(user_id, session)
+        self._notify_pending()
+        return session
+
+    def save(self, user_id: str, session: Session) -> None:
+        with self._lock:
+            self._save(user_id, session)
+        self._notify_pending()
+
+    def exists(self, user_id: str) -> bool:
+        with self._lock:
+            self._evict_expired()
+            exists = user_id in self._sessions
+        self._notify_pending()
+        return exists
+
+    def delete(self, user_id: str) -> None:
+        with self._lock:
+            self._remove(user_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._evict_expired()
+            stats = {"sessions": len(self._sessions), "bytes": sum(self._sizes.values())}
+        self._notify_pending()
+        return stats
+
+
+class RedisSessionBackend(SessionBackend):
+    """
+    Session store in Redis (or any server speaking its protocol), shared by all worker processes
+    and kept across restarts of the application.
+
+    Sessions are stored as zlib-compressed compact JSON under a sliding TTL. Limiting the number
+    of sessions is left to the server's `maxmemory` / `maxmemory-policy allkeys-lru` settings;
+    since expiry happens on the server, eviction listeners are not notified (the service container's
+    periodic sweep releases the data of expired sessions instead).
+    """
+
+    key_prefix = "chatbot:session:"
+
+    def __init__(self, ttl_seconds: float, max_session_bytes: int, url: Optional[str] = None,
+                 client: Optional[redis.Redis] = None) -> None:
+        super().__init__(ttl_seconds=ttl_seconds, max_session_bytes=max_session_bytes)
+        self.client = client or redis.Redis.from_url(url)
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.key_prefix}{user_id}"
+
+    def get(self, user_id: str) -> Optional[Session]:
+        key = self._key(user_id)
+        payload = self.client.getex(key, ex=int(self.ttl_seconds))
+        return json.loads(zlib.decompress(payload)) if payload else None
+
+    def save(self, user_id: str, session: Session) -> None:
+        _trim_history(session, self.max_session_bytes)
+        self.client.set(self._key(user_id), zlib.compress(_serialize(session)), ex=int(self.ttl_seconds))
+
+    def exists(self, user_id: str) -> bool:
+        return bool(self.client.exists(self._key(user_id)))
+
+    def delete(self, user_id: str) -> None:
+        self.client.delete(self._key(user_id))
+
+    def stats(self) -> Dict[str, int]:
+        keys = list(self.client.scan_iter(match=f"{self.key_prefix}*"))
+        pipeline = self.client.pipeline()
+        for key in keys:
+            pipeline.strlen(key)
+        return {"sessions": len(keys), "bytes": sum(pipeline.execute())}
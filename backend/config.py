@@ -16,6 +16,93 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if not os.path.isabs(GOOGLE_CREDENTIALS_PATH):
     GOOGLE_CREDENTIALS_PATH = PROJECT_ROOT / GOOGLE_CREDENTIALS_PATH
 
+# Run the development server in debug mode
+DEBUG = os.getenv("FLASK_DEBUG", "false").lower() in ("1", "true")
+
+# Construct all services at startup instead of on the first requests
+WARM_UP_ON_START = os.getenv("WARM_UP_ON_START", "false").lower() in ("1", "true")
+
+# Add a per-stage timing breakdown of each request as a Server-Timing response header
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() in ("1", "true")
+
+# Log level of the application (DEBUG also enables verbose agent tracing)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Directory for persisting the vector database (kept in memory only if not set)
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "")
+if VECTOR_DB_PATH and not os.path.isabs(VECTOR_DB_PATH):
+    VECTOR_DB_PATH = PROJECT_ROOT / VECTOR_DB_PATH
+
+# Google Docs API requests: timeout of one request and retries of transient errors (with exponential backoff)
+GOOGLE_API_TIMEOUT_SECONDS = float(os.getenv("GOOGLE_API_TIMEOUT_SECONDS", "30"))
+GOOGLE_API_MAX_RETRIES = int(os.getenv("GOOGLE_API_MAX_RETRIES", "3"))
+
+# Vector index type of each (collection, user) partition: "flat" (exact), "hnsw" or "ivfpq" (approximate)
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat").lower()
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+# IVF-PQ partitions are trained once they hold this many vectors and stay exact until then
+IVF_TRAIN_THRESHOLD = int(os.getenv("IVF_TRAIN_THRESHOLD", "10000"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+PQ_M = int(os.getenv("PQ_M", "64"))
+
+# Maximum size of a document chunk in tokens (kept well below the embedding model's input limit)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+
+# Retrieval: number of chunks fetched per collection and the maximum L2 distance of a relevant chunk
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+RETRIEVAL_DISTANCE_THRESHOLD = float(os.getenv("RETRIEVAL_DISTANCE_THRESHOLD", "0.7"))
+
+# Optional lexical (BM25) re-rank of retrieved chunks; RERANK_WEIGHT is the share of the lexical score
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true")
+RERANK_WEIGHT = float(os.getenv("RERANK_WEIGHT", "0.3"))
+
+# Token budget for the document context of a test case generation prompt
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))
+
+# Embedding requests: texts per request, concurrent requests, rate limit and retries of transient errors
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+EMBEDDING_MAX_WORKERS = int(os.getenv("EMBEDDING_MAX_WORKERS", "4"))
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "600"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+
+# Background document ingestion: concurrent jobs and how long finished jobs can be queried
+INGESTION_MAX_WORKERS = int(os.getenv("INGESTION_MAX_WORKERS", "2"))
+INGESTION_JOB_RETENTION_SECONDS = int(os.getenv("INGESTION_JOB_RETENTION_SECONDS", "3600"))
+
+# Cache of generated test cases (RESPONSE_CACHE_SIZE=0 disables it). With a similarity threshold above 0,
+# feature names whose embeddings are at least that similar (cosine) to a cached one reuse its test cases
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "500"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY_THRESHOLD", "0"))
+
+# Embedding cache: number of embeddings kept in memory and optional SQLite file for the disk tier
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+if EMBEDDING_CACHE_PATH and not os.path.isabs(EMBEDDING_CACHE_PATH):
+    EMBEDDING_CACHE_PATH = PROJECT_ROOT / EMBEDDING_CACHE_PATH
+
+# Session backend: "memory" (single process, lost on restart) or "redis" (shared by all worker processes)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Document loading job state: "memory" (single process) or "redis" (shared by all worker processes).
+# A job holds its Redis lock for at most INGESTION_LOCK_TIMEOUT_SECONDS, so a crashed worker does not block others
+INGESTION_JOB_BACKEND = os.getenv("INGESTION_JOB_BACKEND", SESSION_BACKEND).lower()
+INGESTION_LOCK_TIMEOUT_SECONDS = int(os.getenv("INGESTION_LOCK_TIMEOUT_SECONDS", "900"))
+
+# Interval of the sweep that releases the documents and loading jobs of users whose sessions expired (0 disables it)
+SESSION_SWEEP_INTERVAL_SECONDS = int(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "300"))
+
+# Session limits: idle time before a session expires, max number of sessions and max size of one session
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", "262144"))
+
+# Chat memory: "buffer" keeps the whole history, "summary" keeps the last N turns and summarizes older ones
+MEMORY_MODE = os.getenv("MEMORY_MODE", "buffer").lower()
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "6"))
+
 # Validate API Key
 if not GEMINI_API_KEY:
     raise ValueError('GEMINI_API_KEY is not set. Please configure it in the .env file.')
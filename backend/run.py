@@ -1,7 +1,12 @@
+import logging
 from flask import Flask
+from backend.app.container import services
 from backend.app.routes import chat_bp
+from backend.config import LOG_LEVEL, DEBUG, WARM_UP_ON_START
 import os
 
+logging.basicConfig(level=LOG_LEVEL)
+
 # Create Flask app
 app = Flask(__name__, template_folder=os.path.join(os.path.dirname(__file__), "../frontend/templates"),
             static_folder=os.path.join(os.path.dirname(__file__), "../frontend/static"))
@@ -9,5 +14,9 @@ app = Flask(__name__, template_folder=os.path.join(os.path.dirname(__file__), ".
 # Register Blueprint
 app.register_blueprint(chat_bp)
 
+# Services are otherwise constructed lazily, on the first requests that need them
+if WARM_UP_ON_START:
+    services.warm_up()
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=DEBUG)
@@ -0,0 +1,89 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+class StructuralChunker:
+    """
+    Splits a document, given as structural blocks, into token-bounded chunks along its sections.
+
+    Sections start at headings and, in documents without heading styles, at "Feature N:" lines.
+    A section that fits into the token budget becomes one chunk; larger sections are split between
+    blocks, and a single oversized block is split further by characters. Every chunk records the
+    path of headings it belongs to.
+
+    Token counts are estimated at about 4 characters per token.
+    """
+
+    chars_per_token = 4
+    feature_pattern = re.compile(r"^Feature \d+:")
+    feature_level = 100  # Feature lines nest below all heading levels
+
+    def __init__(self, max_tokens: int = 512) -> None:
+        self.max_tokens = max_tokens
+
+    def count_tokens(self, text: str) -> int:
+        return len(text) // self.chars_per_token + 1
+
+    def _section_level(self, block: Dict) -> Optional[int]:
+        if block["type"] == "heading":
+            return block["level"]
+        if block["type"] == "paragraph" and self.feature_pattern.match(block["text"]):
+            return self.feature_level
+        return None
+
+    @staticmethod
+    def _format_block(block: Dict) -> str:
+        if block["type"] == "list_item":
+            return f"{'  ' * block['level']}- {block['text']}"
+        return block["text"]
+
+    def split(self, blocks: List[Dict]) -> List[Tuple[str, List[str]]]:
+        """
+        Splits the document into chunks.
+
+        Args:
+            blocks (List[Dict]): The document blocks, as extracted by GoogleDocLoader.
+
+        Returns:
+            List[Tuple[str, List[str]]]: The text of each chunk with its section path.
+        """
+        chunks = []
+        path: List[Tuple[int, str]] = []  # [(level, heading text)] of the current section
+        section: List[str] = []
+
+        for block in blocks:
+            level = self._section_level(block)
+            if level is not None:
+                chunks.extend(self._split_section(section, [title for _, title in path]))
+                section = []
+                path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, block["text"])]
+            section.append(self._format_block(block))
+
+        chunks.extend(self._split_section(section, [title for _, title in path]))
+        return chunks
+
+    def _split_section(self, section: List[str], section_path: List[str]) -> List[Tuple[str, List[str]]]:
+        if not section:
+            return []
+
+        text = "\n".join(section)
+        if self.count_tokens(text) <= self.max_tokens:
+            return [(text, section_path)]
+
+        # Continuation chunks repeat the section path, so they still carry their context
+        header = " > ".join(section_path)
+        budget = max(self.max_tokens - self.count_tokens(header), 1)
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=budget * self.chars_per_token, chunk_overlap=0)
+        pieces, current = [], []
+        for part in section:
+            for piece in (text_splitter.split_text(part) if self.count_tokens(part) > budget else [part]):
+                if current and self.count_tokens("\n".join(current + [piece])) > budget:
+                    pieces.append("\n".join(current))
+                    current = []
+                current.append(piece)
+        if current:
+            pieces.append("\n".join(current))
+
+        return [(piece if i == 0 or not header else f"{header}\n{piece}", section_path)
+                for i, piece in enumerate(pieces)]
@@ -0,0 +1,102 @@
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings keyed by (model, task_type, sha256(text)).
+
+    Entries are kept in an in-memory LRU tier and, if a path is given, in a SQLite disk tier
+    that survives restarts. Hits and misses are counted per looked-up item.
+    """
+
+    def __init__(self, max_items: int = 10000, disk_path: Optional[str | Path] = None) -> None:
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.connection = None
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(disk_path, check_same_thread=False)
+            with self.connection:
+                self.connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+
+    @staticmethod
+    def make_key(model: str, task_type: str, text: str) -> str:
+        """
+        Builds the cache key of a text.
+
+        Args:
+            model (str): The embedding model name.
+            task_type (str): The embedding type.
+            text (str): The embedded text.
+
+        Returns:
+            str: The cache key.
+        """
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}:{task_type}:{digest}"
+
+    def _remember(self, key: str, embedding: List[float]) -> None:
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Looks up embeddings, first in memory and then on disk.
+
+        Args:
+            keys (Iterable[str]): The cache keys to look up.
+
+        Returns:
+            Dict[str, List[float]]: The found embeddings by key; missing keys are left out.
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                elif self.connection:
+                    row = self.connection.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                    if row:
+                        found[key] = np.frombuffer(row[0], dtype=np.float32).tolist()
+                        self._remember(key, found[key])
+
+                if key in found:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        """
+        Stores embeddings in both cache tiers.
+
+        Args:
+            items (Dict[str, List[float]]): The embeddings by cache key.
+        """
+        with self._lock:
+            for key, embedding in items.items():
+                self._remember(key, embedding)
+            if self.connection:
+                with self.connection:
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                        [(key, np.asarray(embedding, dtype=np.float32).tobytes()) for key, embedding in items.items()]
+                    )
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit/miss counters and the number of embeddings held in memory."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_items": len(self._memory)}
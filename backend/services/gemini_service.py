@@ -1,12 +1,23 @@
 import google.generativeai as genai
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 from langchain_google_genai import ChatGoogleGenerativeAI
-from backend.config import GEMINI_API_KEY
+from backend.config import (GEMINI_API_KEY, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH, EMBEDDING_BATCH_SIZE,
+                            EMBEDDING_MAX_WORKERS, EMBEDDING_REQUESTS_PER_MINUTE, EMBEDDING_MAX_RETRIES)
+from backend.services.embedding_cache import EmbeddingCache
+from backend.services.rate_limiting import TokenBucket, call_with_backoff
+from backend.services.llm_callbacks import LLMMetricsCallbackHandler
+from backend.services.metrics import trace_stage, register_stats
 
 
 class GeminiService:
     """Handles AI interactions with Google Gemini."""
 
+    embedding_model = "models/embedding-001"
+    embedding_cache = EmbeddingCache(max_items=EMBEDDING_CACHE_SIZE, disk_path=EMBEDDING_CACHE_PATH)
+    embedding_executor = ThreadPoolExecutor(max_workers=EMBEDDING_MAX_WORKERS, thread_name_prefix="embedding")
+    embedding_rate_limiter = TokenBucket(rate=EMBEDDING_REQUESTS_PER_MINUTE / 60, capacity=EMBEDDING_MAX_WORKERS)
+
     def __init__(self):
         genai.configure(api_key=GEMINI_API_KEY)
         model = "gemini-1.5-flash"
@@ -16,6 +27,7 @@ class GeminiService:
             google_api_key=GEMINI_API_KEY,
             temperature=0.3,
             max_output_tokens=2048,
+            callbacks=[LLMMetricsCallbackHandler()],
         )
 
     def generate_content(self, prompt: str) -> str:
@@ -34,17 +46,59 @@ class GeminiService:
         except Exception as e:
             return f"⚠️ Error processing request: {str(e)}"
 
-    @staticmethod
-    def embed_content(content: str | List[str], task_type: str) -> List[List[float]] | List[float]:
+    @classmethod
+    def _embed_batch(cls, batch: Dict[str, str], task_type: str) -> Dict[str, List[float]]:
+        """Embeds one batch of {cache key: text} under the rate limit and caches the result."""
+        def request():
+            cls.embedding_rate_limiter.acquire()
+            return genai.embed_content(model=cls.embedding_model, content=list(batch.values()), task_type=task_type)
+
+        response = call_with_backoff(request, max_retries=EMBEDDING_MAX_RETRIES)
+        fetched = dict(zip(batch, response["embedding"]))
+        # Cached per batch, so re-running a failed upload only embeds the batches that did not finish
+        cls.embedding_cache.set_many(fetched)
+        return fetched
+
+    @classmethod
+    def _split_missing(cls, keys: List[str], texts: List[str],
+                       embeddings: Dict[str, List[float]]) -> List[Dict[str, str]]:
+        """Splits the texts missing from the cache into batches, embedding every distinct text once."""
+        missing = list({key: text for key, text in zip(keys, texts) if key not in embeddings}.items())
+        return [dict(missing[i:i + EMBEDDING_BATCH_SIZE]) for i in range(0, len(missing), EMBEDDING_BATCH_SIZE)]
+
+    @classmethod
+    def embed_content(cls, content: str | List[str], task_type: str) -> List[List[float]] | List[float]:
         """
         Generates embeddings for the given content.
 
+        Embeddings are looked up per text in the embedding cache; only the cache misses are sent to Gemini,
+        in batches that are embedded concurrently, rate limited and retried on transient errors.
+
         Args:
-            content (str): The text to embed.
+            content (str | List[str]): The text to embed.
             task_type (str): The embedding type.
 
         Returns:
             List[List[float]] | List[float]: A list representing the content's embedding.
         """
-        response = genai.embed_content(model="models/embedding-001", content=content, task_type=task_type)
-        return response["embedding"]
+        texts = [content] if isinstance(content, str) else content
+        keys = [EmbeddingCache.make_key(cls.embedding_model, task_type, text) for text in texts]
+        with trace_stage("embed"):
+            embeddings = cls.embedding_cache.get_many(keys)
+
+            batches = cls._split_missing(keys, texts, embeddings)
+            if len(batches) == 1:
+                embeddings.update(cls._embed_batch(batches[0], task_type))
+            elif batches:
+                for fetched in cls.embedding_executor.map(lambda batch: cls._embed_batch(batch, task_type), batches):
+                    embeddings.update(fetched)
+
+        results = [embeddings[key] for key in keys]
+        return results[0] if isinstance(content, str) else results
+
+
+register_stats("embedding_cache", GeminiService.embedding_cache.stats, {
+    "hits": ("chatbot_embedding_cache_hits", "counter", "Embeddings found in the embedding cache"),
+    "misses": ("chatbot_embedding_cache_misses", "counter", "Embeddings not found in the embedding cache"),
+    "memory_items": ("chatbot_embedding_cache_items", "gauge", "Embeddings held in memory by the embedding cache")
+})
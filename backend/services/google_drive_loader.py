@@ -1,8 +1,15 @@
 import re
-from googleapiclient.discovery import build
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, Resource
 from googleapiclient.errors import HttpError
 from google.oauth2 import service_account
-from backend.config import GOOGLE_CREDENTIALS_PATH
+from backend.services.metrics import trace_stage
+from backend.config import GOOGLE_CREDENTIALS_PATH, GOOGLE_API_TIMEOUT_SECONDS, GOOGLE_API_MAX_RETRIES
 
 
 class GoogleDocLoader:
@@ -11,23 +18,162 @@ class GoogleDocLoader:
 
     This class handles authentication with the Google API using a service account
     and provides access to Google Docs content in read-only mode.
+
+    Documents are extracted as structural blocks (headings, paragraphs, list items and tables).
+    The blocks are cached by document ID and revision ID (shared by all loaders), so a document
+    that has not changed since its last load is only checked with a lightweight revision request.
+
+    The API service is built once from the bundled (static) discovery document and is shared by all
+    threads, but httplib2 connections are not thread-safe: each thread sends its requests through its
+    own authorized HTTP client, so concurrent loads neither race nor wait for each other. Transient
+    errors (429 and 5xx) are retried with exponential backoff.
     """
 
-    def __init__(self) -> None:
+    cache_size = 100
+    _cache: OrderedDict[str, Tuple[str, List[Dict]]] = OrderedDict()  # {document_id: (revision_id, blocks)}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, timeout: float = GOOGLE_API_TIMEOUT_SECONDS,
+                 max_retries: int = GOOGLE_API_MAX_RETRIES) -> None:
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.credentials = service_account.Credentials.from_service_account_file(
+            GOOGLE_CREDENTIALS_PATH, scopes=["https://www.googleapis.com/auth/documents.readonly"]
+        )
         self.service = self._authenticate()
+        self._local = threading.local()  # The HTTP client of each thread
 
-    @staticmethod
-    def _authenticate() -> build:
+    def _new_http(self) -> AuthorizedHttp:
+        """Creates an HTTP client that signs requests with the shared credentials."""
+        return AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=self.timeout))
+
+    def _authenticate(self) -> Resource:
         """
         Authenticates with the Google Docs API using service account credentials.
 
         Returns:
-            build: A Google Docs API service resource for making requests.
+            Resource: A Google Docs API service resource for making requests.
         """
-        creds = service_account.Credentials.from_service_account_file(
-            GOOGLE_CREDENTIALS_PATH, scopes=["https://www.googleapis.com/auth/documents.readonly"]
-        )
-        return build("docs", "v1", credentials=creds)
+        return build("docs", "v1", http=self._new_http(), static_discovery=True, cache_discovery=False)
+
+    @property
+    def http(self) -> AuthorizedHttp:
+        """The HTTP client of the current thread, created on first use."""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = self._new_http()
+        return http
+
+    def _get(self, doc_id: str, fields: Optional[str] = None) -> dict:
+        try:
+            request = self.service.documents().get(documentId=doc_id, fields=fields)
+            with trace_stage("fetch"):
+                return request.execute(http=self.http, num_retries=self.max_retries)
+        except HttpError as e:
+            raise Exception(f"⚠️ Google Docs API Error: {e.error_details}")
+        except Exception as e:
+            raise Exception(f"⚠️ Unexpected Error: {str(e)}")
+
+    @staticmethod
+    def _paragraph_text(paragraph: dict) -> str:
+        return "".join(run["textRun"]["content"] for run in paragraph.get("elements", []) if "textRun" in run).strip()
+
+    @classmethod
+    def _extract_blocks(cls, content: List[dict]) -> List[Dict]:
+        """
+        Converts the structural elements of a document body into a flat list of blocks.
+
+        Each block is a dict with "type" ("heading", "paragraph", "list_item" or "table"), "text" and "level"
+        (the heading level with TITLE as 0, or the nesting level of a list item).
+        """
+        blocks = []
+        for element in content:
+            if "paragraph" in element:
+                paragraph = element["paragraph"]
+                text = cls._paragraph_text(paragraph)
+                if not text:
+                    continue
+                style = paragraph.get("paragraphStyle", {}).get("namedStyleType", "")
+                if style == "TITLE":
+                    blocks.append({"type": "heading", "level": 0, "text": text})
+                elif style.startswith("HEADING_"):
+                    blocks.append({"type": "heading", "level": int(style.split("_")[1]), "text": text})
+                elif "bullet" in paragraph:
+                    level = paragraph["bullet"].get("nestingLevel", 0)
+                    blocks.append({"type": "list_item", "level": level, "text": text})
+                else:
+                    blocks.append({"type": "paragraph", "level": 0, "text": text})
+            elif "table" in element:
+                rows = []
+                for row in element["table"].get("tableRows", []):
+                    cells = [" ".join(block["text"] for block in cls._extract_blocks(cell.get("content", [])))
+                             for cell in row.get("tableCells", [])]
+                    rows.append(" | ".join(cells))
+                blocks.append({"type": "table", "level": 0, "text": "\n".join(rows)})
+        return blocks
+
+    @staticmethod
+    def blocks_to_text(blocks: List[Dict]) -> str:
+        """
+        Joins document blocks into plain text.
+
+        Args:
+            blocks (List[Dict]): The document blocks.
+
+        Returns:
+            str: The text content.
+        """
+        return "\n".join(block["text"] for block in blocks)
+
+    def fetch_document_blocks(self, doc_url: str) -> Tuple[List[Dict], str]:
+        """
+        Extracts the structural blocks and the revision of a Google Doc given its document URL.
+
+        Args:
+            doc_url (str): The URL of the Google Document.
+
+        Returns:
+            Tuple[List[Dict], str]: The document blocks and the revision key. The key is
+                                    "<document_id>@<revision_id>", or a content hash if the API
+                                    does not expose the revision to the service account.
+        """
+        doc_id = re.search(r"document/d/([a-zA-Z0-9-_]+)", doc_url).group(1)
+
+        with self._cache_lock:
+            cached = self._cache.get(doc_id)
+        if cached:
+            revision_id = self._get(doc_id, fields="revisionId").get("revisionId")
+            if revision_id and revision_id == cached[0]:
+                with self._cache_lock:
+                    self._cache.move_to_end(doc_id)
+                return cached[1], f"{doc_id}@{revision_id}"
+
+        doc = self._get(doc_id)
+        blocks = self._extract_blocks(doc.get("body", {}).get("content", []))
+        revision_id = doc.get("revisionId")
+        if not revision_id:
+            digest = hashlib.sha256(self.blocks_to_text(blocks).encode("utf-8")).hexdigest()
+            return blocks, f"{doc_id}@sha256:{digest}"
+
+        with self._cache_lock:
+            self._cache[doc_id] = (revision_id, blocks)
+            self._cache.move_to_end(doc_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return blocks, f"{doc_id}@{revision_id}"
+
+    def fetch_document(self, doc_url: str) -> Tuple[str, str]:
+        """
+        Extracts text content and the revision of a Google Doc given its document URL.
+
+        Args:
+            doc_url (str): The URL of the Google Document.
+
+        Returns:
+            Tuple[str, str]: The extracted text content and its revision key.
+        """
+        blocks, revision_id = self.fetch_document_blocks(doc_url)
+        return self.blocks_to_text(blocks), revision_id
 
     def load_document(self, doc_url: str) -> str:
         """
@@ -39,17 +185,4 @@ class GoogleDocLoader:
         Returns:
             str: The extracted text content from the document.
         """
-        doc_id = re.search(r"document/d/([a-zA-Z0-9-_]+)", doc_url).group(1)
-        try:
-            doc = self.service.documents().get(documentId=doc_id).execute()
-        except HttpError as e:
-            raise Exception(f"⚠️ Google Docs API Error: {e.error_details}")
-        except Exception as e:
-            raise Exception(f"⚠️ Unexpected Error: {str(e)}")
-        text = []
-        for element in doc.get("body", {}).get("content", []):
-            if "paragraph" in element:
-                for run in element["paragraph"].get("elements", []):
-                    if "textRun" in run:
-                        text.append(run["textRun"]["content"])
-        return "".join(text).strip()
+        return self.fetch_document(doc_url)[0]
@@ -0,0 +1,59 @@
+import time
+from typing import Any, Dict, List, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from backend.services.metrics import record_llm_call
+
+
+class LLMMetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback handler that records the count, latency and token usage of LLM calls
+    (see `backend.services.metrics`). Attach it to a model to cover every chain and agent using it.
+    """
+
+    def __init__(self) -> None:
+        self._running: Dict[UUID, Tuple[float, str]] = {}  # {run_id: (start time, model)}
+
+    @staticmethod
+    def _model_name(serialized: Dict[str, Any], kwargs: Dict[str, Any]) -> str:
+        invocation_params = kwargs.get("invocation_params") or {}
+        metadata = kwargs.get("metadata") or {}
+        model = (invocation_params.get("model") or invocation_params.get("model_name")
+                 or metadata.get("ls_model_name") or (serialized or {}).get("name") or "unknown")
+        return model.removeprefix("models/")
+
+    @staticmethod
+    def _token_usage(response: LLMResult) -> Tuple[int, int]:
+        """Returns the prompt and completion tokens, from the message usage metadata or the provider output."""
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+        if not prompt_tokens and not completion_tokens:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+        return prompt_tokens, completion_tokens
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._running[run_id] = (time.perf_counter(), self._model_name(serialized, kwargs))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            **kwargs: Any) -> None:
+        self._running[run_id] = (time.perf_counter(), self._model_name(serialized, kwargs))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        start, model = self._running.pop(run_id, (None, "unknown"))
+        if start is None:
+            return
+        prompt_tokens, completion_tokens = self._token_usage(response)
+        record_llm_call(model, time.perf_counter() - start, prompt_tokens, completion_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        start, model = self._running.pop(run_id, (None, "unknown"))
+        if start is not None:
+            record_llm_call(model, time.perf_counter() - start, failed=True)
@@ -0,0 +1,166 @@
+import os
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+                               multiprocess)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+
+logger = logging.getLogger(__name__)
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+REQUEST_LATENCY = Histogram("chatbot_request_duration_seconds", "Latency of HTTP requests (time to the first byte "
+                            "for streamed responses)", ["endpoint"], buckets=LATENCY_BUCKETS)
+STAGE_LATENCY = Histogram("chatbot_stage_duration_seconds", "Latency of a processing stage",
+                          ["stage"], buckets=LATENCY_BUCKETS)
+STAGE_ERRORS = Counter("chatbot_stage_errors_total", "Processing stages that raised an error", ["stage"])
+LLM_CALLS = Counter("chatbot_llm_calls_total", "LLM calls", ["model", "status"])
+LLM_TOKENS = Counter("chatbot_llm_tokens_total", "Tokens of LLM calls", ["model", "type"])
+LLM_LATENCY = Histogram("chatbot_llm_call_duration_seconds", "Latency of an LLM call",
+                        ["model"], buckets=LATENCY_BUCKETS)
+
+
+class StatsCollector(Collector):
+    """
+    Exports the `stats()` of application components, e.g. caches and the session store, read on every scrape.
+
+    A component is registered with `register_stats`; its values are exported as gauges or counters.
+    """
+
+    def __init__(self) -> None:
+        self._sources: Dict[str, Tuple[Callable[[], Dict[str, float]], Dict[str, Tuple[str, str, str]]]] = {}
+
+    def register(self, source: str, stats: Callable[[], Dict[str, float]],
+                 metrics: Dict[str, Tuple[str, str, str]]) -> None:
+        self._sources[source] = (stats, metrics)
+
+    def collect(self) -> Iterator[GaugeMetricFamily | CounterMetricFamily]:
+        for source, (stats, metrics) in list(self._sources.items()):
+            try:
+                values = stats()
+            except Exception:
+                logger.exception("Failed to read the stats of %s", source)
+                continue
+            for key, (name, kind, documentation) in metrics.items():
+                family = CounterMetricFamily if kind == "counter" else GaugeMetricFamily
+                yield family(name, documentation, value=values[key])
+
+
+STATS_COLLECTOR = StatsCollector()
+REGISTRY.register(STATS_COLLECTOR)
+
+
+def register_stats(source: str, stats: Callable[[], Dict[str, float]],
+                   metrics: Dict[str, Tuple[str, str, str]]) -> None:
+    """
+    Exports the values returned by a component's `stats()` as metrics. Registering a source again replaces it.
+
+    Args:
+        source (str): The name of the component, e.g. "sessions".
+        stats (Callable[[], Dict[str, float]]): Returns the current values by key.
+        metrics (Dict[str, Tuple[str, str, str]]): The (metric name, "gauge" or "counter", description)
+                                                   of each exported key.
+    """
+    STATS_COLLECTOR.register(source, stats, metrics)
+
+
+# Stage timings of the current request: {stage: seconds}, or None outside of a timed request
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def start_request_timing() -> None:
+    """Starts collecting the stage timings of the current request (see `request_timings`)."""
+    _request_timings.set({})
+
+
+def request_timings() -> Dict[str, float]:
+    """
+    Returns the time the current request spent in each stage so far.
+
+    Stages can be nested (e.g. "generate" runs within "agent"), so the timings do not add up
+    to the request latency. Work handed over to a thread pool is only included if the stage
+    is traced by the thread that waits for it.
+
+    Returns:
+        Dict[str, float]: The seconds spent per stage, in the order the stages were first entered.
+    """
+    return dict(_request_timings.get() or {})
+
+
+def _record_timing(stage: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def trace_stage(stage: str) -> Iterator[None]:
+    """
+    Measures a processing stage, e.g. `with trace_stage("embed"): ...`.
+
+    The latency is recorded in the stage histogram and in the timings of the current request;
+    a stage that raises an error is counted as well.
+
+    Args:
+        stage (str): The name of the stage.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage).observe(elapsed)
+        _record_timing(stage, elapsed)
+
+
+def record_llm_call(model: str, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0,
+                    failed: bool = False) -> None:
+    """
+    Records one LLM call.
+
+    Args:
+        model (str): The model name.
+        seconds (float): The latency of the call.
+        prompt_tokens (int): The number of prompt (input) tokens.
+        completion_tokens (int): The number of completion (output) tokens.
+        failed (bool): Whether the call raised an error.
+    """
+    LLM_CALLS.labels(model, "error" if failed else "success").inc()
+    LLM_LATENCY.labels(model).observe(seconds)
+    LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+    _record_timing("llm", seconds)
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Formats stage timings as a Server-Timing header value, e.g. "embed;dur=12.5, search;dur=3.1"."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def export_metrics() -> Tuple[bytes, str]:
+    """
+    Renders all metrics in the Prometheus text format.
+
+    With several worker processes, set PROMETHEUS_MULTIPROC_DIR to a shared, empty directory
+    so the metrics of all workers are aggregated.
+
+    Returns:
+        Tuple[bytes, str]: The metrics and their content type.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(STATS_COLLECTOR)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
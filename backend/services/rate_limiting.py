@@ -0,0 +1,78 @@
+import time
+import random
+import logging
+import threading
+from typing import Callable, TypeVar
+from google.api_core.exceptions import GoogleAPICallError
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the rate of API requests.
+
+    The bucket refills at `rate` tokens per second up to `capacity`, which bounds the burst size.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Takes tokens from the bucket and returns how long the caller has to wait for them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Blocks until the tokens are available."""
+        wait = self._reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Tells whether an API error is transient: rate limiting (429) or a server error (5xx)."""
+    return isinstance(error, GoogleAPICallError) and error.code in RETRYABLE_STATUS_CODES
+
+
+def _backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    # Full jitter, so concurrent workers that were throttled together do not retry together
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def call_with_backoff(func: Callable[[], T], max_retries: int = 5, base_delay: float = 1.0,
+                      max_delay: float = 60.0) -> T:
+    """
+    Calls `func`, retrying transient API errors with exponential backoff.
+
+    Args:
+        func (Callable[[], T]): The API call.
+        max_retries (int): How many times to retry before giving up.
+        base_delay (float): The delay ceiling of the first retry in seconds; it doubles with each retry.
+        max_delay (float): The maximum delay between retries in seconds.
+
+    Returns:
+        T: The result of the call.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = _backoff_delay(attempt, base_delay, max_delay)
+            logger.warning("Transient API error (%s), retrying in %.1fs", e, delay)
+            time.sleep(delay)
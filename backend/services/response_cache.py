@@ -0,0 +1,157 @@
+import re
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+Scope = Tuple[Tuple[str, ...], str]  # (document revisions, prompt template hash)
+
+
+class ResponseCache:
+    """
+    In-memory cache of generated responses with TTL and LRU eviction.
+
+    A response is keyed by the revisions of the documents it was generated from, the normalized
+    request text and the hash of the prompt template, so it is shared by all users asking the same
+    question about the same document revisions. If a similarity threshold is set, a request whose
+    embedding is close enough to a cached one with the same revisions and template is served too.
+    """
+
+    def __init__(self, max_items: int = 500, ttl_seconds: float = 86400,
+                 similarity_threshold: float = 0.0) -> None:
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, dict] = OrderedDict()  # least recently used first
+        self._scopes: Dict[Scope, set] = {}  # {scope: keys}, for the similarity lookup
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercases the text, collapses whitespace and strips surrounding punctuation."""
+        return re.sub(r"\s+", " ", text).strip(" \t.,;:!?\"'").lower()
+
+    @classmethod
+    def make_key(cls, revisions: Tuple[str, ...], text: str, template_hash: str) -> str:
+        """
+        Builds the cache key of a request.
+
+        Args:
+            revisions (Tuple[str, ...]): The revisions of the documents the response is based on.
+            text (str): The request text, e.g. a feature name.
+            template_hash (str): The hash of the prompt template.
+
+        Returns:
+            str: The cache key.
+        """
+        raw = "\0".join([*revisions, cls.normalize(text), template_hash])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        keys = self._scopes.get(entry["scope"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._scopes[entry["scope"]]
+
+    def _find_similar(self, scope: Scope, embedding: List[float]) -> Optional[str]:
+        query = np.asarray(embedding, dtype=np.float32)
+        best_key, best_similarity = None, self.similarity_threshold
+        for key in self._scopes.get(scope, ()):
+            cached = self._entries[key]["embedding"]
+            if cached is None:
+                continue
+            similarity = float(np.dot(query, cached) / (np.linalg.norm(query) * np.linalg.norm(cached) or 1))
+            if similarity >= best_similarity:
+                best_key, best_similarity = key, similarity
+        return best_key
+
+    def get(self, revisions: Tuple[str, ...], text: str, template_hash: str,
+            embedding: Optional[List[float]] = None) -> Optional[str]:
+        """
+        Looks up a cached response, by exact key first and then by embedding similarity.
+
+        Args:
+            revisions (Tuple[str, ...]): The revisions of the documents the response is based on.
+            text (str): The request text.
+            template_hash (str): The hash of the prompt template.
+            embedding (Optional[List[float]]): The embedding of the request text, for the similarity lookup.
+
+        Returns:
+            Optional[str]: The cached response, or None.
+        """
+        key = self.make_key(revisions, text, template_hash)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and embedding is not None and self.similarity_threshold > 0:
+                similar_key = self._find_similar((revisions, template_hash), embedding)
+                entry = self._entries.get(similar_key) if similar_key else None
+                key = similar_key or key
+
+            if entry is not None and entry["expires_at"] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["response"]
+
+    def set(self, revisions: Tuple[str, ...], text: str, template_hash: str, response: str,
+            embedding: Optional[List[float]] = None) -> None:
+        """
+        Caches a response.
+
+        Args:
+            revisions (Tuple[str, ...]): The revisions of the documents the response is based on.
+            text (str): The request text.
+            template_hash (str): The hash of the prompt template.
+            response (str): The response to cache.
+            embedding (Optional[List[float]]): The embedding of the request text, for the similarity lookup.
+        """
+        key = self.make_key(revisions, text, template_hash)
+        scope = (revisions, template_hash)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "response": response,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+                "scope": scope,
+                "embedding": np.asarray(embedding, dtype=np.float32) if embedding is not None else None
+            }
+            self._scopes.setdefault(scope, set()).add(key)
+
+            while len(self._entries) > self.max_items:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, revisions: Iterable[str]) -> int:
+        """
+        Drops the responses based on any of the given document revisions.
+
+        Args:
+            revisions (Iterable[str]): The outdated document revisions.
+
+        Returns:
+            int: The number of dropped responses.
+        """
+        revisions = set(revisions)
+        with self._lock:
+            keys = [key for scope, scope_keys in self._scopes.items()
+                    if revisions.intersection(scope[0]) for key in scope_keys]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit and miss counts and the number of cached responses."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "items": len(self._entries)}
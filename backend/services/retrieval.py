@@ -0,0 +1,121 @@
+import math
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+
+class LexicalReranker:
+    """
+    Re-ranks vector search results by fusing their distance with a BM25 score of the query terms.
+
+    BM25 statistics are computed over the candidates themselves, so no separate lexical index
+    has to be maintained. Both scores are min-max normalized before being mixed by `weight`.
+    """
+
+    token_pattern = re.compile(r"\w+")
+
+    def __init__(self, weight: float = 0.3, k1: float = 1.5, b: float = 0.75) -> None:
+        self.weight = weight  # share of the lexical score in the fused score
+        self.k1 = k1
+        self.b = b
+
+    def tokenize(self, text: str) -> List[str]:
+        return self.token_pattern.findall(text.lower())
+
+    def bm25_scores(self, query: str, documents: List[str]) -> List[float]:
+        """
+        Scores the documents against the query with BM25.
+
+        Args:
+            query (str): The search query text.
+            documents (List[str]): The documents to score.
+
+        Returns:
+            List[float]: The BM25 score of each document.
+        """
+        tokenized = [self.tokenize(document) for document in documents]
+        if not tokenized:
+            return []
+        avg_length = sum(len(tokens) for tokens in tokenized) / len(tokenized) or 1
+        document_frequency = Counter(term for tokens in tokenized for term in set(tokens))
+
+        scores = []
+        for tokens in tokenized:
+            term_frequency = Counter(tokens)
+            score = 0.0
+            for term in set(self.tokenize(query)):
+                if term not in term_frequency:
+                    continue
+                idf = math.log(1 + (len(tokenized) - document_frequency[term] + 0.5) /
+                               (document_frequency[term] + 0.5))
+                tf = term_frequency[term]
+                score += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * len(tokens) / avg_length))
+            scores.append(score)
+        return scores
+
+    @staticmethod
+    def _normalize(values: List[float]) -> List[float]:
+        low, high = min(values), max(values)
+        if high == low:
+            return [1.0] * len(values)
+        return [(value - low) / (high - low) for value in values]
+
+    def rerank(self, query: str, scored_documents: List[Tuple[str, float]]) -> List[Tuple[str, float]]:
+        """
+        Orders vector search results by their fused relevance.
+
+        Args:
+            query (str): The search query text.
+            scored_documents (List[Tuple[str, float]]): (text, L2 distance) pairs from the vector search.
+
+        Returns:
+            List[Tuple[str, float]]: (text, fused score) pairs, the most relevant first.
+        """
+        if not scored_documents:
+            return []
+
+        texts = [text for text, _ in scored_documents]
+        vector_scores = self._normalize([-distance for _, distance in scored_documents])
+        lexical_scores = self._normalize(self.bm25_scores(query, texts))
+
+        fused = [(text, (1 - self.weight) * vector + self.weight * lexical)
+                 for text, vector, lexical in zip(texts, vector_scores, lexical_scores)]
+        return sorted(fused, key=lambda item: item[1], reverse=True)
+
+
+class ContextPacker:
+    """
+    Selects chunks for an LLM prompt within a token budget.
+
+    Chunks are taken in the given (relevance) order; a chunk that does not fit into the remaining
+    budget is skipped so smaller, less relevant chunks can still fill it.
+    Token counts are estimated at about 4 characters per token.
+    """
+
+    chars_per_token = 4
+
+    def __init__(self, max_tokens: int) -> None:
+        self.max_tokens = max_tokens
+
+    def count_tokens(self, text: str) -> int:
+        return len(text) // self.chars_per_token + 1
+
+    def pack(self, chunks: List[str], max_tokens: Optional[int] = None) -> Tuple[List[str], int]:
+        """
+        Picks the chunks that fit into the budget.
+
+        Args:
+            chunks (List[str]): The candidate chunks, the most relevant first.
+            max_tokens (Optional[int]): The token budget. Defaults to the packer's `max_tokens`.
+
+        Returns:
+            Tuple[List[str], int]: The selected chunks, in their original order, and the tokens they use.
+        """
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        packed, used = [], 0
+        for chunk in chunks:
+            tokens = self.count_tokens(chunk)
+            if used + tokens <= budget:
+                packed.append(chunk)
+                used += tokens
+        return packed, used
@@ -1,19 +1,114 @@
-import numpy as np
+import threading
 import faiss
-from typing import List
+import numpy as np
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from backend.services.vector_db_storage import VectorDBStorage
+from backend.services.vector_index import VectorIndexFactory
 
 
 class VectorDB:  # FAISS
-    def __init__(self):
-        self.index_store = {}  # indices per collection
-        self.doc_store = {}  # {collection: {doc_id: {text, metadata}}}
-        self.doc_id_map = {}  # {collection: {faiss_index: doc_id}}
+    """
+    Stores document embeddings in FAISS indices partitioned by (collection, user_id),
+    so a search only touches the vectors of the user who issued it.
+
+    If a persistence directory is given, every change is written to disk. After a restart, each
+    partition is loaded on first use: its index memory-mapped read-only and its document texts
+    from the SQLite sidecar. A mapped index is read into RAM before it is first changed.
+    Worker processes may share the directory: before each access, the partition's version is
+    checked in the sidecar, so partitions that other processes created, changed or deleted are
+    loaded, reloaded or released.
+
+    The index type of the partitions (exact or approximate) is chosen by the index factory.
+
+    Each partition has a lock, held while it is changed or searched, so concurrent ingestion jobs,
+    deletions and searches of the same partition run one after another.
+    """
+
+    def __init__(self, persist_dir: Optional[str | Path] = None, index_factory: Optional[VectorIndexFactory] = None):
+        self.index_factory = index_factory or VectorIndexFactory()
+        self.index_store = {}  # {(collection, user_id): faiss index}
+        self.doc_store = {}  # {(collection, user_id): {doc_id: {text, metadata, faiss_id}}}
+        self.doc_id_map = {}  # {(collection, user_id): {faiss_index: doc_id}}
+        self.next_ids = {}  # {(collection, user_id): next free faiss index}, of the partitions known to this process
+        self._versions: Dict[Tuple[str, str], int] = {}  # Persisted version of each known partition
+        self._mapped: Set[Tuple[str, str]] = set()  # Partitions whose index is memory-mapped (read-only)
+        self._partition_locks: Dict[Tuple[str, str], threading.RLock] = {}
+        self._lock = threading.Lock()  # Guards adding and dropping partitions
+
+        self.storage = VectorDBStorage(persist_dir) if persist_dir else None
+
+    @staticmethod
+    def _partition_key(collection: str, user_id: str) -> Tuple[str, str]:
+        return collection, user_id
+
+    @contextmanager
+    def _locked(self, key: Tuple[str, str]) -> Iterator[None]:
+        """Holds the lock of a partition. The lock is released for good once the partition does not exist."""
+        while True:
+            with self._lock:
+                lock = self._partition_locks.setdefault(key, threading.RLock())
+            with lock:
+                # Threads that waited for a released lock retry with a new one
+                if self._partition_locks.get(key) is not lock:
+                    continue
+                try:
+                    self._sync(key)
+                    yield
+                finally:
+                    with self._lock:
+                        if key not in self.next_ids and self._partition_locks.get(key) is lock:
+                            del self._partition_locks[key]
+                return
+
+    def _sync(self, key: Tuple[str, str]) -> None:
+        """Picks up the changes other processes made to a persisted partition. The caller holds the partition's lock."""
+        if not self.storage:
+            return
+        stored = self.storage.get_partition(key)
+        if stored is None and key not in self.next_ids:
+            return
+        if stored is not None and key in self.next_ids and self._versions.get(key) == stored[1]:
+            return
+
+        with self._lock:
+            self._release(key)
+            if stored is not None:
+                self.next_ids[key], self._versions[key] = stored
+
+    def _get_index(self, key: Tuple[str, str]) -> Optional[faiss.Index]:
+        """Returns a partition's index, memory-mapping it from storage on first access."""
+        if key not in self.index_store and key in self.next_ids and self.storage:
+            self.index_store[key] = self.index_factory.configure(self.storage.load_index(key))
+            self._mapped.add(key)
+        return self.index_store.get(key)
+
+    def _get_writable_index(self, key: Tuple[str, str]) -> faiss.Index:
+        """Returns a partition's index, reading it into RAM first if it is memory-mapped."""
+        index = self._get_index(key)
+        if key in self._mapped:
+            index = self.index_factory.configure(self.storage.load_index(key, writable=True))
+            self.index_store[key] = index
+            self._mapped.discard(key)
+        return index
+
+    def _get_docs(self, key: Tuple[str, str]) -> Dict[str, dict]:
+        """Returns a partition's documents, loading them from storage on first access."""
+        if key not in self.doc_store and key in self.next_ids and self.storage:
+            self.doc_store[key] = self.storage.load_documents(key)
+            self.doc_id_map[key] = {doc["faiss_id"]: doc_id for doc_id, doc in self.doc_store[key].items()}
+        return self.doc_store.get(key, {})
 
     def store_data(self, chunks: List[str], embeddings: List[List[float]],
                    doc_ids: List[str], metadata: List[dict], collection: str) -> None:
         """
         Stores document data in the vector database.
 
+        Each chunk is placed in the partition of the user given by its metadata ("user_id").
+        Storing a doc_id that already exists replaces its previous vector (upsert).
+
         Args:
             chunks (List[str]): A list of document chunks to be stored.
             embeddings (List[List[float]]): A list of corresponding embeddings.
@@ -23,74 +118,258 @@ class VectorDB:  # FAISS
         """
         embeddings = np.array(embeddings, dtype=np.float32)
 
-        # Ensure a FAISS index exists for this collection
-        if collection not in self.index_store:
-            self.index_store[collection] = faiss.IndexIDMap(faiss.IndexFlatL2(embeddings.shape[1]))
-            self.doc_id_map[collection] = {}
+        # Group chunk positions by the partition they belong to
+        partitions = defaultdict(list)
+        for i, meta in enumerate(metadata):
+            partitions[self._partition_key(collection, meta.get("user_id"))].append(i)
+
+        for key, positions in partitions.items():
+            with self._locked(key):
+                self._store_partition_data(key, [chunks[i] for i in positions], embeddings[positions],
+                                           [doc_ids[i] for i in positions], [metadata[i] for i in positions])
 
-        index = self.index_store[collection]
+    def _store_partition_data(self, key: Tuple[str, str], chunks: List[str], embeddings: np.ndarray,
+                              doc_ids: List[str], metadata: List[dict]) -> None:
+        # Ensure a FAISS index exists for this partition
+        if key not in self.next_ids:
+            with self._lock:
+                self.index_store[key] = self.index_factory.create(embeddings.shape[1])
+                self.doc_store[key] = {}
+                self.doc_id_map[key] = {}
+                self.next_ids[key] = 0
+
+        # Drop the previous vectors of documents that are being replaced
+        self._remove_docs(key, doc_ids)
 
         # Assign unique integer FAISS indices to document IDs
-        start_idx = len(self.doc_id_map[collection])
-        int_ids = np.array(range(start_idx, start_idx + len(doc_ids)), dtype=np.int64)
+        start_idx = self.next_ids[key]
+        int_ids = np.arange(start_idx, start_idx + len(doc_ids), dtype=np.int64)
+        self.next_ids[key] = start_idx + len(doc_ids)
 
-        index.add_with_ids(embeddings, int_ids)
+        self.index_store[key] = self.index_factory.add(self._get_writable_index(key), embeddings, int_ids)
 
         # Store document texts and metadata
-        if collection not in self.doc_store:
-            self.doc_store[collection] = {}
+        upserted = {}
+        for faiss_id, doc_id, text, meta in zip(int_ids.tolist(), doc_ids, chunks, metadata):
+            upserted[doc_id] = {"text": text, "metadata": meta, "faiss_id": faiss_id}
+            self.doc_id_map[key][faiss_id] = doc_id  # Map FAISS index → doc_id
+        self.doc_store[key].update(upserted)
+
+        if self.storage:
+            self._versions[key] = self.storage.save_partition(key, self.index_store[key], self.next_ids[key],
+                                                              upserted=upserted, removed=[])
+
+    def _remove_docs(self, key: Tuple[str, str], doc_ids: List[str]) -> List[str]:
+        """
+        Removes the given documents (if present) from a partition's index and stores.
+
+        Returns:
+            List[str]: IDs of the documents that were actually removed.
+        """
+        partition_docs = self._get_docs(key)
+        removed = [doc_id for doc_id in doc_ids if doc_id in partition_docs]
+        if not removed:
+            return []
+
+        faiss_ids = [partition_docs.pop(doc_id)["faiss_id"] for doc_id in removed]
+        self.index_store[key] = self.index_factory.remove(self._get_writable_index(key),
+                                                          np.array(faiss_ids, dtype=np.int64))
+        for faiss_id in faiss_ids:
+            self.doc_id_map[key].pop(faiss_id, None)
+        return removed
+
+    def _release(self, key: Tuple[str, str]) -> None:
+        """Forgets a partition in this process. The caller holds `_lock`."""
+        for store in (self.index_store, self.doc_store, self.doc_id_map, self.next_ids, self._versions):
+            store.pop(key, None)
+        self._mapped.discard(key)
+
+    def _drop_partition(self, key: Tuple[str, str]) -> None:
+        """Releases a partition's index and all of its stored documents. The caller holds the partition's lock."""
+        with self._lock:
+            self._release(key)
+        if self.storage:
+            self.storage.delete_partition(key)
+
+    def get_doc_ids(self, collection: str, user_id: str) -> Set[str]:
+        """
+        Returns the IDs of all documents stored for a user in a collection.
+
+        Args:
+            collection (str): The name of the vector database collection.
+            user_id (str): The unique identifier of the user.
+
+        Returns:
+            Set[str]: The stored document IDs.
+        """
+        key = self._partition_key(collection, user_id)
+        with self._locked(key):
+            return set(self._get_docs(key))
+
+    def get_metadata(self, collection: str, user_id: str) -> Dict[str, dict]:
+        """
+        Returns the metadata of all documents stored for a user in a collection.
+
+        Args:
+            collection (str): The name of the vector database collection.
+            user_id (str): The unique identifier of the user.
+
+        Returns:
+            Dict[str, dict]: The metadata of each stored document by its ID.
+        """
+        key = self._partition_key(collection, user_id)
+        with self._locked(key):
+            return {doc_id: doc["metadata"] for doc_id, doc in self._get_docs(key).items()}
+
+    def update_metadata(self, collection: str, user_id: str, metadata: Dict[str, dict]) -> None:
+        """
+        Replaces the metadata of stored documents of a user, keeping their vectors.
+
+        Args:
+            collection (str): The name of the vector database collection.
+            user_id (str): The unique identifier of the user.
+            metadata (Dict[str, dict]): The new metadata by document ID. Unknown document IDs are ignored.
+        """
+        key = self._partition_key(collection, user_id)
+        with self._locked(key):
+            partition_docs = self._get_docs(key)
+            updated = {doc_id: meta for doc_id, meta in metadata.items() if doc_id in partition_docs}
+            for doc_id, meta in updated.items():
+                partition_docs[doc_id]["metadata"] = meta
+
+            if updated and self.storage:
+                self._versions[key] = self.storage.save_metadata(key, updated)
+
+    def delete_data(self, collection: str, user_id: str, doc_ids: Optional[List[str]] = None) -> None:
+        """
+        Deletes documents of a user from a collection.
 
-        for i, doc_id in enumerate(doc_ids):
-            self.doc_store[collection][doc_id] = {"text": chunks[i], "metadata": metadata[i]}
-            self.doc_id_map[collection][start_idx + i] = doc_id  # Map FAISS index → doc_id
+        Args:
+            collection (str): The name of the vector database collection.
+            user_id (str): The unique identifier of the user.
+            doc_ids (Optional[List[str]]): IDs of the documents to delete. Deletes all of them if omitted.
+        """
+        key = self._partition_key(collection, user_id)
+        with self._locked(key):
+            if key not in self.next_ids:
+                return
+
+            if doc_ids is None:
+                self._drop_partition(key)
+                return
+
+            removed = self._remove_docs(key, doc_ids)
+            if removed and self.storage:
+                self._versions[key] = self.storage.save_partition(key, self.index_store[key], self.next_ids[key],
+                                                                  upserted={}, removed=removed)
+
+    def delete_user(self, user_id: str) -> None:
+        """
+        Deletes all documents of a user from every collection.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+        """
+        with self._lock:
+            keys = {key for key in self.next_ids if key[1] == user_id}
+        if self.storage:
+            keys.update(self.storage.list_partitions(user_id=user_id))
+        for key in keys:
+            with self._locked(key):
+                self._drop_partition(key)
+
+    def get_user_ids(self) -> Set[str]:
+        """
+        Returns the IDs of all users with stored documents, including those of persisted partitions not loaded yet.
+
+        Returns:
+            Set[str]: The user IDs.
+        """
+        with self._lock:
+            user_ids = {user_id for _, user_id in self.next_ids}
+        if self.storage:
+            user_ids.update(user_id for _, user_id in self.storage.list_partitions())
+        return user_ids
 
     def retrieve_relevant_data(self, query_embedding: List[List[float]], collection: str,
-                               metadata: dict, distance_threshold: float = 0.7) -> List[str]:
+                               metadata: dict, distance_threshold: float = 0.7,
+                               top_k: Optional[int] = None) -> List[str]:
         """
         Retrieves documents based on FAISS similarity search with distance filtering.
 
+        Only the partition of the user given in the metadata filters ("user_id") is searched.
+
+        Args:
+            query_embedding (List[List[float]]): The query embedding.
+            collection (str): Collection to search in.
+            metadata (dict): Metadata filters, must contain "user_id".
+            distance_threshold (float): Maximum L2 distance for relevance.
+            top_k (Optional[int]): Maximum number of documents to return. Returns all matches if omitted.
+
+        Returns:
+            List[str]: list of relevant data, the closest first
+        """
+        return [text for text, _ in self.retrieve_scored_data(query_embedding, collection, metadata,
+                                                              distance_threshold, top_k)]
+
+    def retrieve_scored_data(self, query_embedding: List[List[float]], collection: str,
+                             metadata: dict, distance_threshold: float = 0.7,
+                             top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Like `retrieve_relevant_data`, but returns each document together with its L2 distance to the query.
+
         Args:
             query_embedding (List[List[float]]): The query embedding.
             collection (str): Collection to search in.
-            metadata (dict): Metadata filters.
+            metadata (dict): Metadata filters, must contain "user_id".
             distance_threshold (float): Maximum L2 distance for relevance.
+            top_k (Optional[int]): Maximum number of documents to return. Returns all matches if omitted.
 
         Returns:
-            List[str]: list of relevant data
+            List[Tuple[str, float]]: (text, distance) of the relevant documents, ordered by distance
         """
-        if collection not in self.index_store:
+        key = self._partition_key(collection, metadata.get("user_id"))
+        with self._locked(key):
+            return self._search_partition(key, query_embedding, metadata, distance_threshold, top_k)
+
+    def _search_partition(self, key: Tuple[str, str], query_embedding: List[List[float]], metadata: dict,
+                          distance_threshold: float, top_k: Optional[int]) -> List[Tuple[str, float]]:
+        index = self._get_index(key)
+        if index is None:
             return []
 
-        index = self.index_store[collection]
         query_embedding = np.array([query_embedding], dtype=np.float32)  # Ensure 2D
 
-        # Search for all potential matches
-        num_docs = index.ntotal  # Total stored embeddings
+        num_docs = index.ntotal
         if num_docs == 0:
             return []
 
-        distances, indices = index.search(query_embedding, num_docs)
+        extra_filters = {k: v for k, v in metadata.items() if k != "user_id"}
+
+        # Extra filters may reject some of the nearest documents, so only cap the search without them
+        num_candidates = min(top_k, num_docs) if top_k and not extra_filters else num_docs
+        distances, indices = index.search(query_embedding, num_candidates)
 
         results = []
         seen_doc_ids = set()
-        collection_docs = self.doc_store.get(collection, {})
-
-        for i, idx in enumerate(indices[0]):
-            if idx == -1 or idx not in self.doc_id_map[collection]:  # Ensure valid FAISS index
-                continue
+        partition_docs = self._get_docs(key)
+        id_map = self.doc_id_map[key]
 
-            doc_id = self.doc_id_map[collection][idx]
+        for distance, idx in zip(distances[0], indices[0]):
+            # Results are sorted by distance, so nothing past the threshold can match
+            if idx == -1 or distance > distance_threshold:
+                break
 
-            if doc_id in seen_doc_ids:  # Avoid duplicates
+            doc_id = id_map.get(idx)
+            if doc_id is None or doc_id in seen_doc_ids:  # Avoid duplicates
                 continue
 
             seen_doc_ids.add(doc_id)
-            doc_data = collection_docs[doc_id]
+            doc_data = partition_docs[doc_id]
 
-            # Apply distance threshold and metadata filtering
-            if distances[0][i] <= distance_threshold and all(
-                doc_data["metadata"].get(key) == value for key, value in metadata.items()
-            ):
-                results.append(doc_data["text"])
+            if all(doc_data["metadata"].get(k) == v for k, v in extra_filters.items()):
+                results.append((doc_data["text"], float(distance)))
+                if top_k and len(results) == top_k:
+                    break
 
         return results
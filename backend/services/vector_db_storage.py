@@ -0,0 +1,194 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import faiss
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class VectorDBStorage:
+    """
+    On-disk backend for VectorDB.
+
+    Every (collection, user_id) partition is kept as a FAISS index file, while document texts and
+    metadata live in a SQLite sidecar. Indices can be loaded memory-mapped for searching, so their
+    vectors stay in the page cache instead of the process's memory.
+
+    Several processes may share the directory: each change of a partition increments its version,
+    so the others can tell when to reload it.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.index_dir = self.path / "indexes"
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path / "documents.sqlite3", check_same_thread=False)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")  # Readers of other processes do not block writers
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS partitions ("
+                "collection TEXT, user_id TEXT, next_id INTEGER, version INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (collection, user_id))"
+            )
+            columns = {row[1] for row in self.connection.execute("PRAGMA table_info(partitions)")}
+            if "version" not in columns:
+                self.connection.execute("ALTER TABLE partitions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "collection TEXT, user_id TEXT, doc_id TEXT, faiss_id INTEGER, text TEXT, metadata TEXT, "
+                "PRIMARY KEY (collection, user_id, doc_id))"
+            )
+
+    def _index_path(self, key: Tuple[str, str]) -> Path:
+        name = hashlib.sha1("\0".join(key).encode("utf-8")).hexdigest()
+        return self.index_dir / f"{name}.faiss"
+
+    def list_partitions(self, user_id: Optional[str] = None) -> Dict[Tuple[str, str], int]:
+        """
+        Returns the persisted partitions.
+
+        Args:
+            user_id (Optional[str]): Only return the partitions of this user. All if omitted.
+
+        Returns:
+            Dict[Tuple[str, str], int]: The next free FAISS index of each (collection, user_id) partition.
+        """
+        with self._lock:
+            if user_id is None:
+                rows = self.connection.execute("SELECT collection, user_id, next_id FROM partitions").fetchall()
+            else:
+                rows = self.connection.execute(
+                    "SELECT collection, user_id, next_id FROM partitions WHERE user_id = ?", (user_id,)
+                ).fetchall()
+        return {(collection, user_id): next_id for collection, user_id, next_id in rows}
+
+    def get_partition(self, key: Tuple[str, str]) -> Optional[Tuple[int, int]]:
+        """
+        Returns the state of a persisted partition.
+
+        Args:
+            key (Tuple[str, str]): The (collection, user_id) partition.
+
+        Returns:
+            Optional[Tuple[int, int]]: The next free FAISS index and the version of the partition,
+                                       or None if it is not persisted.
+        """
+        with self._lock:
+            return self.connection.execute(
+                "SELECT next_id, version FROM partitions WHERE collection = ? AND user_id = ?", key
+            ).fetchone()
+
+    def _version(self, key: Tuple[str, str]) -> int:
+        row = self.connection.execute(
+            "SELECT version FROM partitions WHERE collection = ? AND user_id = ?", key
+        ).fetchone()
+        return row[0] if row else 0  # The partition was deleted by another process
+
+    def load_index(self, key: Tuple[str, str], writable: bool = False) -> faiss.Index:
+        """
+        Loads a partition's FAISS index.
+
+        Args:
+            key (Tuple[str, str]): The (collection, user_id) partition.
+            writable (bool): Read the index into RAM, so it can be changed. Otherwise the vectors
+                             (flat codes) are memory-mapped from the file and the index is read-only.
+
+        Returns:
+            faiss.Index: The loaded index.
+        """
+        return faiss.read_index(str(self._index_path(key)), 0 if writable else faiss.IO_FLAG_MMAP_IFC)
+
+    def load_documents(self, key: Tuple[str, str]) -> Dict[str, dict]:
+        """
+        Loads the texts and metadata of a partition's documents.
+
+        Args:
+            key (Tuple[str, str]): The (collection, user_id) partition.
+
+        Returns:
+            Dict[str, dict]: {doc_id: {text, metadata, faiss_id}}
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT doc_id, faiss_id, text, metadata FROM documents WHERE collection = ? AND user_id = ?", key
+            ).fetchall()
+        return {
+            doc_id: {"text": text, "metadata": json.loads(metadata), "faiss_id": faiss_id}
+            for doc_id, faiss_id, text, metadata in rows
+        }
+
+    def save_partition(self, key: Tuple[str, str], index: faiss.Index, next_id: int,
+                       upserted: Dict[str, dict], removed: List[str]) -> int:
+        """
+        Persists the changes made to a partition.
+
+        Args:
+            key (Tuple[str, str]): The (collection, user_id) partition.
+            index (faiss.Index): The partition's current index.
+            next_id (int): The next free FAISS index of the partition.
+            upserted (Dict[str, dict]): Added or replaced documents, {doc_id: {text, metadata, faiss_id}}.
+            removed (List[str]): IDs of the deleted documents.
+
+        Returns:
+            int: The new version of the partition.
+        """
+        # Write to a temporary file first, so the file is replaced as a whole
+        index_path = self._index_path(key)
+        tmp_path = index_path.with_suffix(".tmp")
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, index_path)
+
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO partitions (collection, user_id, next_id, version) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (collection, user_id) DO UPDATE SET next_id = excluded.next_id, version = version + 1",
+                (*key, next_id)
+            )
+            self.connection.executemany(
+                "DELETE FROM documents WHERE collection = ? AND user_id = ? AND doc_id = ?",
+                [(*key, doc_id) for doc_id in removed]
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO documents (collection, user_id, doc_id, faiss_id, text, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(*key, doc_id, doc["faiss_id"], doc["text"], json.dumps(doc["metadata"]))
+                 for doc_id, doc in upserted.items()]
+            )
+            return self._version(key)
+
+    def save_metadata(self, key: Tuple[str, str], metadata: Dict[str, dict]) -> int:
+        """
+        Persists new metadata of stored documents, without rewriting the partition's index.
+
+        Args:
+            key (Tuple[str, str]): The (collection, user_id) partition.
+            metadata (Dict[str, dict]): The new metadata by document ID.
+
+        Returns:
+            int: The new version of the partition.
+        """
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "UPDATE documents SET metadata = ? WHERE collection = ? AND user_id = ? AND doc_id = ?",
+                [(json.dumps(meta), *key, doc_id) for doc_id, meta in metadata.items()]
+            )
+            self.connection.execute(
+                "UPDATE partitions SET version = version + 1 WHERE collection = ? AND user_id = ?", key
+            )
+            return self._version(key)
+
+    def delete_partition(self, key: Tuple[str, str]) -> None:
+        """
+        Deletes a partition's index file and documents.
+
+        Args:
+            key (Tuple[str, str]): The (collection, user_id) partition.
+        """
+        self._index_path(key).unlink(missing_ok=True)
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM partitions WHERE collection = ? AND user_id = ?", key)
+            self.connection.execute("DELETE FROM documents WHERE collection = ? AND user_id = ?", key)
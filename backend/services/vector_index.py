@@ -0,0 +1,133 @@
+import math
+import logging
+import faiss
+import numpy as np
+from typing import Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+
+class VectorIndexFactory:
+    """
+    Creates and maintains the FAISS indices of VectorDB partitions.
+
+    Supported index types:
+    - "flat": exact brute-force search (IndexFlatL2). Query cost grows linearly with the partition.
+    - "hnsw": approximate graph search (IndexHNSWFlat). HNSW cannot delete vectors, so removing
+      documents rebuilds the graph from the remaining vectors.
+    - "ivfpq": approximate search over product-quantized inverted lists (IndexIVFPQ). A partition
+      starts as a flat index and is trained and converted once it holds `train_threshold` vectors;
+      smaller partitions would not give the quantizers enough training points.
+    """
+
+    def __init__(self, index_type: str = "flat", hnsw_m: int = 32, hnsw_ef_search: int = 64,
+                 train_threshold: int = 10000, ivf_nprobe: int = 16, pq_m: int = 64) -> None:
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown vector index type '{index_type}', expected one of {INDEX_TYPES}")
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_search = hnsw_ef_search
+        self.train_threshold = train_threshold
+        self.ivf_nprobe = ivf_nprobe
+        self.pq_m = pq_m
+
+    @staticmethod
+    def _is_hnsw(index: faiss.Index) -> bool:
+        return isinstance(index, faiss.IndexIDMap) and isinstance(faiss.downcast_index(index.index), faiss.IndexHNSW)
+
+    @staticmethod
+    def _stored_vectors(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the (vectors, ids) held by an ID-mapped flat or HNSW index."""
+        ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+        vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+        return vectors, ids
+
+    def create(self, dimension: int) -> faiss.Index:
+        """
+        Creates an empty index of the configured type.
+
+        Args:
+            dimension (int): The dimensionality of the embeddings.
+
+        Returns:
+            faiss.Index: The new index.
+        """
+        if self.index_type == "hnsw":
+            index = faiss.IndexIDMap2(faiss.IndexHNSWFlat(dimension, self.hnsw_m))
+        else:
+            # IVF-PQ partitions stay flat until they are large enough to train
+            index = faiss.IndexIDMap(faiss.IndexFlatL2(dimension))
+        return self.configure(index)
+
+    def configure(self, index: faiss.Index) -> faiss.Index:
+        """
+        Applies the search-time parameters, which are not persisted with the index.
+
+        Args:
+            index (faiss.Index): A new or loaded index.
+
+        Returns:
+            faiss.Index: The same index.
+        """
+        if self._is_hnsw(index):
+            faiss.downcast_index(index.index).hnsw.efSearch = self.hnsw_ef_search
+        elif isinstance(index, faiss.IndexIVF):
+            index.nprobe = self.ivf_nprobe
+        return index
+
+    def add(self, index: faiss.Index, vectors: np.ndarray, ids: np.ndarray) -> faiss.Index:
+        """
+        Adds vectors to an index, converting it to IVF-PQ once it crosses the training threshold.
+
+        Args:
+            index (faiss.Index): The partition's index.
+            vectors (np.ndarray): The vectors to add.
+            ids (np.ndarray): Their FAISS IDs.
+
+        Returns:
+            faiss.Index: The index holding the vectors; a new one if the partition was converted.
+        """
+        index.add_with_ids(vectors, ids)
+        if (self.index_type == "ivfpq" and not isinstance(index, faiss.IndexIVF)
+                and index.ntotal >= self.train_threshold):
+            index = self._train_ivfpq(index)
+        return index
+
+    def remove(self, index: faiss.Index, ids: np.ndarray) -> faiss.Index:
+        """
+        Removes vectors from an index.
+
+        Args:
+            index (faiss.Index): The partition's index.
+            ids (np.ndarray): FAISS IDs of the vectors to remove.
+
+        Returns:
+            faiss.Index: The index without the vectors; a new one if it had to be rebuilt.
+        """
+        if not self._is_hnsw(index):
+            index.remove_ids(ids)
+            return index
+
+        vectors, stored_ids = self._stored_vectors(index)
+        keep = ~np.isin(stored_ids, ids)
+        rebuilt = self.configure(faiss.IndexIDMap2(faiss.IndexHNSWFlat(index.d, self.hnsw_m)))
+        if keep.any():
+            rebuilt.add_with_ids(vectors[keep], stored_ids[keep])
+        return rebuilt
+
+    def _train_ivfpq(self, index: faiss.Index) -> faiss.Index:
+        vectors, ids = self._stored_vectors(index)
+
+        # FAISS wants about 39 training points per inverted list
+        nlist = max(1, min(int(4 * math.sqrt(len(vectors))), len(vectors) // 39))
+        pq_m = self.pq_m if index.d % self.pq_m == 0 else 1
+        nbits = min(8, int(math.log2(len(vectors))))  # Each sub-quantizer trains 2**nbits centroids
+        ivf_index = faiss.IndexIVFPQ(faiss.IndexFlatL2(index.d), index.d, nlist, pq_m, nbits)
+        ivf_index.train(vectors)
+        ivf_index.add_with_ids(vectors, ids)
+        logger.info("Converted a partition of %d vectors to IVF-PQ with %d lists", len(vectors), nlist)
+        return self.configure(ivf_index)
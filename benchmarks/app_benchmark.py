@@ -0,0 +1,207 @@
+"""
+Measures the latency and throughput of document ingestion, retrieval and the /chat flow offline, with the
+stand-ins of `benchmarks.fakes` in place of Gemini and the Google Docs API.
+
+Scenarios:
+    ingest    every request loads a specification document for a new user
+    retrieve  every request searches both documents of a user for a feature
+    chat      every user sends document links, a question and feature names to /chat, one after another
+
+Application settings (e.g. VECTOR_INDEX_TYPE, RERANK_ENABLED, RESPONSE_CACHE_SIZE, EMBEDDING_MAX_WORKERS)
+are read from the environment as usual, so runs with different settings can be compared. The .env file is
+not used for the storage and session settings: the benchmark keeps everything in memory unless set otherwise.
+
+Usage (from the project root):
+    python -m benchmarks.app_benchmark --scenario chat --users 20 --concurrency 8 --features 50
+    RESPONSE_CACHE_SIZE=0 python -m benchmarks.app_benchmark --scenario retrieve --requests 500 --json run.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Tuple
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# The fakes need no API key or credentials, but the configuration requires them
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+os.environ.setdefault("GOOGLE_CREDENTIALS_PATH", os.devnull)
+for name, value in {"VECTOR_DB_PATH": "", "EMBEDDING_CACHE_PATH": "", "SESSION_BACKEND": "memory"}.items():
+    os.environ.setdefault(name, value)
+
+from prometheus_client import REGISTRY  # noqa: E402
+from backend.app.container import services  # noqa: E402
+from benchmarks.fakes import FakeGeminiService, FakeGoogleDocLoader, feature_name  # noqa: E402
+
+SCENARIOS = ["ingest", "retrieve", "chat"]
+COLLECTIONS = ["specification", "test_cases"]
+STAGES = ["fetch", "chunk", "embed", "index", "search", "agent", "generate", "llm"]
+
+
+def timed(operation: Callable, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    operation(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def run_concurrently(operation: Callable[[int], List[float]], items: Iterable[int],
+                     concurrency: int) -> Tuple[List[float], int, float]:
+    """
+    Runs the operation for every item on `concurrency` threads.
+
+    Returns:
+        Tuple[List[float], int, float]: The latencies of all requests, the number of failed operations
+                                        and the wall-clock time.
+    """
+    def run(item: int) -> Tuple[List[float], bool]:
+        try:
+            return operation(item), False
+        except Exception as e:
+            print(f"⚠️ Operation {item} failed: {e}", file=sys.stderr)
+            return [], True
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(run, items))
+    elapsed = time.perf_counter() - start
+    return [latency for latencies, _ in results for latency in latencies], sum(failed for _, failed in results), elapsed
+
+
+def load_documents(user_id: str, index: int, num_documents: int) -> None:
+    for collection, prefix in zip(COLLECTIONS, ["spec", "tests"]):
+        services.document_manager.load_and_store_document(
+            doc_link=FakeGoogleDocLoader.doc_url(f"{prefix}-{index % num_documents}"),
+            collection=collection, user_id=user_id
+        )
+
+
+def ingest_scenario(args: argparse.Namespace) -> Tuple[List[float], int, float]:
+    # With fewer documents than requests, documents repeat and are served by the revision and embedding caches
+    def operation(i: int) -> List[float]:
+        return [timed(services.document_manager.load_and_store_document,
+                      doc_link=FakeGoogleDocLoader.doc_url(f"spec-{i % args.documents}"),
+                      collection="specification", user_id=f"bench-ingest-{i}")]
+
+    return run_concurrently(operation, range(args.requests), args.concurrency)
+
+
+def retrieve_scenario(args: argparse.Namespace) -> Tuple[List[float], int, float]:
+    run_concurrently(lambda i: load_documents(f"bench-retrieve-{i}", i, args.documents) or [],
+                     range(args.users), args.concurrency)
+
+    def operation(i: int) -> List[float]:
+        return [timed(services.document_manager.find_similar_data_in_collections,
+                      query=feature_name(i % args.features), collections=COLLECTIONS,
+                      user_id=f"bench-retrieve-{i % args.users}")]
+
+    return run_concurrently(operation, range(args.requests), args.concurrency)
+
+
+def chat_scenario(args: argparse.Namespace) -> Tuple[List[float], int, float]:
+    from backend.run import app
+
+    def operation(i: int) -> List[float]:
+        client = app.test_client()
+        user_id = f"bench-chat-{i}"
+        messages = [FakeGoogleDocLoader.doc_url(f"spec-{i % args.documents}"),
+                    FakeGoogleDocLoader.doc_url(f"tests-{i % args.documents}"),
+                    "What do I need to do next?"]
+        for turn in range(args.turns):
+            if turn:
+                messages.append("1")  # Extract another feature
+            messages.append(feature_name((i + turn) % args.features))
+
+        latencies = []
+        for message in messages:
+            start = time.perf_counter()
+            response = client.post("/chat", json={"user_id": user_id, "message": message})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"/chat returned {response.status_code} for {message!r}")
+        return latencies
+
+    return run_concurrently(operation, range(args.users), args.concurrency)
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return float("nan")
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 2 ** 20 if sys.platform == "darwin" else max_rss / 2 ** 10  # bytes on macOS, KiB on Linux
+
+
+def _sample_total(name: str, **labels: str) -> float:
+    """Sums the samples of a metric with the given labels, e.g. over all models."""
+    return sum(sample.value for metric in REGISTRY.collect() for sample in metric.samples
+               if sample.name == name and all(sample.labels.get(key) == value for key, value in labels.items()))
+
+
+def stage_means_ms() -> Dict[str, float]:
+    """Mean latency of the traced processing stages and of the LLM calls, from the Prometheus histograms."""
+    means = {}
+    for stage in STAGES:
+        metric = "chatbot_llm_call_duration_seconds" if stage == "llm" else "chatbot_stage_duration_seconds"
+        labels = {} if stage == "llm" else {"stage": stage}
+        count = _sample_total(f"{metric}_count", **labels)
+        if count:
+            means[stage] = _sample_total(f"{metric}_sum", **labels) / count * 1000
+    return means
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS, default="chat")
+    parser.add_argument("--requests", type=int, default=100, help="requests of the ingest and retrieve scenarios")
+    parser.add_argument("--users", type=int, default=10, help="users of the retrieve and chat scenarios")
+    parser.add_argument("--turns", type=int, default=3, help="features requested per user in the chat scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent operations (threads)")
+    parser.add_argument("--features", type=int, default=50, help="features per synthetic document")
+    parser.add_argument("--documents", type=int, default=5, help="distinct specification/test case documents")
+    parser.add_argument("--fetch-latency", type=float, default=0.2, help="seconds per Google Docs request")
+    parser.add_argument("--embedding-latency", type=float, default=0.1, help="seconds per embedding request")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per LLM call")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    FakeGeminiService.embedding_latency = args.embedding_latency
+    services.override(gemini_service=FakeGeminiService(llm_latency=args.llm_latency),
+                      google_doc_loader=FakeGoogleDocLoader(num_features=args.features,
+                                                            fetch_latency=args.fetch_latency))
+    services.warm_up()
+
+    scenario = {"ingest": ingest_scenario, "retrieve": retrieve_scenario, "chat": chat_scenario}[args.scenario]
+    latencies, failed, elapsed = scenario(args)
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.array([np.nan])
+
+    results = {
+        "scenario": args.scenario,
+        "settings": vars(args),
+        "requests": len(latencies),
+        "failed_operations": failed,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {name: float(np.percentile(latencies_ms, q))
+                       for name, q in [("p50", 50), ("p95", 95), ("p99", 99), ("max", 100)]},
+        "peak_rss_mb": peak_rss_mb(),
+        "stage_mean_ms": stage_means_ms(),
+    }
+
+    print(f"{args.scenario}: {results['requests']} requests ({failed} failed operations) in {elapsed:.2f} s, "
+          f"{results['requests_per_second']:.1f} requests/s, concurrency {args.concurrency}")
+    print("latency ms:  " + "  ".join(f"{name} {value:.1f}" for name, value in results["latency_ms"].items()))
+    print(f"peak RSS:    {results['peak_rss_mb']:.1f} MB")
+    print("stage mean ms:  " + "  ".join(f"{stage} {value:.1f}" for stage, value in results["stage_mean_ms"].items()))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Local stand-ins for Gemini and the Google Docs API, so the application can be benchmarked offline.
+
+The fakes subclass the real services and only replace their network calls: the embedding cache, batching and
+rate limiting of `GeminiService` and the block extraction and revision cache of `GoogleDocLoader` still run.
+"""
+import re
+import json
+import time
+import hashlib
+from typing import Any, Dict, List, Optional
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from backend.services.gemini_service import GeminiService
+from backend.services.google_drive_loader import GoogleDocLoader
+from backend.services.llm_callbacks import LLMMetricsCallbackHandler
+from backend.services.metrics import trace_stage
+
+
+EMBEDDING_DIMENSION = 768  # models/embedding-001
+FEATURE_WORDS = ["login", "search", "checkout", "profile", "upload", "export", "billing", "settings", "reports",
+                 "notifications", "sharing", "comments", "dashboard", "permissions", "audit", "import"]
+
+
+def feature_name(index: int) -> str:
+    """Returns the name of the synthetic feature with the given index, e.g. "Search Sharing 17"."""
+    first, second = FEATURE_WORDS[index % len(FEATURE_WORDS)], FEATURE_WORDS[(index * 7 + 3) % len(FEATURE_WORDS)]
+    return f"{first.title()} {second.title()} {index}"
+
+
+FEATURE_NAME = re.compile(r"\b[A-Z][a-z]+ [A-Z][a-z]+ \d+\b")
+
+
+def _bag_of_words(words: List[str], dimension: int) -> np.ndarray:
+    vector = np.zeros(dimension, dtype=np.float32)
+    for word in words:
+        vector[int.from_bytes(hashlib.md5(word.encode("utf-8")).digest()[:4], "little") % dimension] += 1
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def hashed_embedding(text: str, dimension: int = EMBEDDING_DIMENSION) -> List[float]:
+    """
+    Deterministic unit-length embedding. The synthetic feature a text mentions most dominates the vector and
+    its words (hashed to dimensions) make up the rest, so a feature name retrieves the chunks about that
+    feature, as it would with a real embedding model.
+    """
+    vector = 0.3 * _bag_of_words(re.findall(r"\w+", text.lower()), dimension)
+    features = FEATURE_NAME.findall(text)
+    if features:
+        topic = max(set(features), key=features.count)
+        vector += _bag_of_words([topic.lower()], dimension)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers after a fixed latency: the agent gets a final answer and any other prompt
+    (test case generation, summaries) gets deterministic test cases for the requested feature.
+    """
+
+    latency: float = 0.5
+    chars_per_token: int = 4
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        if '"Final Answer"' in prompt:
+            answer = {"action": "Final Answer", "action_input": "Send a link to the Specification document."}
+            text = f"```json\n{json.dumps(answer)}\n```"
+        else:
+            feature = re.search(r'\*\*"([^"\n]+)"\*\*', prompt)  # The user query of the test case prompt
+            name = feature.group(1) if feature else "the feature"
+            text = "".join(f"<b>TC-{i}: {name}</b><br>Steps: open {name}, perform action {i}, verify the result.<br>"
+                           for i in range(1, 6))
+
+        input_tokens, output_tokens = len(prompt) // self.chars_per_token, len(text) // self.chars_per_token
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                 "total_tokens": input_tokens + output_tokens}
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None,
+                  **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._respond(messages)
+
+
+class FakeGeminiService(GeminiService):
+    """
+    GeminiService with deterministic embeddings and generations instead of Gemini requests.
+
+    `embedding_latency` is the latency of one embedding request (one batch of texts); it is a class
+    attribute like the rest of the embedding pipeline.
+    """
+
+    embedding_latency = 0.1
+
+    def __init__(self, llm_latency: float = 0.5):
+        self.native_model = None
+        self.langchain_model = FakeChatModel(latency=llm_latency, callbacks=[LLMMetricsCallbackHandler()])
+
+    def generate_content(self, prompt: str) -> str:
+        return self.langchain_model.invoke(prompt).content
+
+    @classmethod
+    def _embed_batch(cls, batch: Dict[str, str], task_type: str) -> Dict[str, List[float]]:
+        cls.embedding_rate_limiter.acquire()
+        time.sleep(cls.embedding_latency)
+        fetched = {key: hashed_embedding(text) for key, text in batch.items()}
+        cls.embedding_cache.set_many(fetched)
+        return fetched
+
+
+class FakeGoogleDocLoader(GoogleDocLoader):
+    """
+    GoogleDocLoader serving synthetic documents with `num_features` features each.
+
+    Document IDs starting with "spec" are specifications (a heading, a description and requirements per
+    feature); any other ID is a test case document (a heading and test cases per feature). The content
+    only depends on the document ID, and the revision stays the same, so reloads hit the revision cache.
+    """
+
+    def __init__(self, num_features: int = 50, fetch_latency: float = 0.2) -> None:
+        self.num_features = num_features
+        self.fetch_latency = fetch_latency
+
+    @staticmethod
+    def doc_url(doc_id: str) -> str:
+        return f"https://docs.google.com/document/d/{doc_id}/edit"
+
+    @staticmethod
+    def _paragraph(text: str, style: str = "NORMAL_TEXT", bullet: bool = False) -> dict:
+        paragraph = {"elements": [{"textRun": {"content": text + "\n"}}], "paragraphStyle": {"namedStyleType": style}}
+        if bullet:
+            paragraph["bullet"] = {"nestingLevel": 0}
+        return {"paragraph": paragraph}
+
+    def _document(self, doc_id: str) -> dict:
+        is_spec = doc_id.startswith("spec")
+        content = [self._paragraph("Specification" if is_spec else "Test Cases", style="TITLE")]
+        for i in range(self.num_features):
+            name = feature_name(i)
+            content.append(self._paragraph(f"Feature {i + 1}: {name}", style="HEADING_2"))
+            if is_spec:
+                content.append(self._paragraph(f"The {name} feature lets users manage their {name.lower()} data "
+                                               f"from the main menu of the application."))
+                content += [self._paragraph(f"The {name} form must validate field {j} and show an error otherwise.",
+                                            bullet=True) for j in range(1, 6)]
+            else:
+                content += [self._paragraph(f"TC-{i + 1}.{j}: Verify that {name} handles scenario {j}: open "
+                                            f"{name}, enter valid data, save, and check the confirmation.")
+                            for j in range(1, 4)]
+        return {"documentId": doc_id, "revisionId": f"{doc_id}-rev-1", "body": {"content": content}}
+
+    def _get(self, doc_id: str, fields: Optional[str] = None) -> dict:
+        with trace_stage("fetch"):
+            time.sleep(self.fetch_latency)
+        document = self._document(doc_id)
+        return {"revisionId": document["revisionId"]} if fields == "revisionId" else document
@@ -0,0 +1,72 @@
+"""
+Compares the recall and query latency of the vector index types on synthetic embeddings.
+
+Usage (from the project root):
+    python -m benchmarks.vector_index_benchmark --vectors 50000 --queries 500 --top-k 10
+"""
+import argparse
+import time
+import numpy as np
+from backend.services.vector_index import INDEX_TYPES, VectorIndexFactory
+
+
+EMBEDDING_DIMENSION = 768  # models/embedding-001
+
+
+def make_embeddings(num_vectors: int, num_queries: int, dimension: int, seed: int = 0):
+    """Generates clustered unit vectors (real embeddings are far from uniform) and nearby queries."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, num_vectors // 100), dimension))
+    vectors = centers[rng.integers(len(centers), size=num_vectors)] + 0.3 * rng.normal(size=(num_vectors, dimension))
+    queries = vectors[rng.integers(num_vectors, size=num_queries)] + 0.1 * rng.normal(size=(num_queries, dimension))
+
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors.astype(np.float32), queries.astype(np.float32)
+
+
+def benchmark(factory: VectorIndexFactory, vectors: np.ndarray, queries: np.ndarray, top_k: int):
+    start = time.perf_counter()
+    index = factory.add(factory.create(vectors.shape[1]), vectors, np.arange(len(vectors), dtype=np.int64))
+    build_seconds = time.perf_counter() - start
+
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids[0])
+    return build_seconds, np.array(latencies), np.array(results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000, help="number of indexed vectors")
+    parser.add_argument("--queries", type=int, default=200, help="number of search queries")
+    parser.add_argument("--top-k", type=int, default=10, help="neighbours retrieved per query")
+    parser.add_argument("--hnsw-ef-search", type=int, default=64)
+    parser.add_argument("--ivf-nprobe", type=int, default=16)
+    parser.add_argument("--pq-m", type=int, default=64)
+    args = parser.parse_args()
+
+    vectors, queries = make_embeddings(args.vectors, args.queries, EMBEDDING_DIMENSION)
+    print(f"{args.vectors} vectors, {args.queries} queries, dimension {EMBEDDING_DIMENSION}, top-{args.top_k}\n")
+    print(f"{'index':<8}{'build s':>10}{'recall':>10}{'mean ms':>10}{'p95 ms':>10}")
+
+    exact_results = None
+    for index_type in INDEX_TYPES:
+        # Train IVF-PQ on the whole data set
+        factory = VectorIndexFactory(index_type=index_type, hnsw_ef_search=args.hnsw_ef_search,
+                                     train_threshold=args.vectors, ivf_nprobe=args.ivf_nprobe, pq_m=args.pq_m)
+        build_seconds, latencies, results = benchmark(factory, vectors, queries, args.top_k)
+        if exact_results is None:
+            exact_results = results  # "flat" is exact and serves as the ground truth
+
+        recall = np.mean([len(set(found) & set(exact)) / args.top_k
+                          for found, exact in zip(results, exact_results)])
+        print(f"{index_type:<8}{build_seconds:>10.2f}{recall:>10.3f}"
+              f"{latencies.mean():>10.3f}{np.percentile(latencies, 95):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,22 +31,103 @@ document.addEventListener("DOMContentLoaded", function () {
         appendMessage(userMessage, "user");
         userInput.value = "";
 
-        fetch("/chat", {
+        fetch("/chat/stream", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify({ user_id: userId, message: userMessage }),
         })
-        .then(response => response.json())
-        .then(data => {
-            appendMessage(data.response, "bot");
-            if (data.menu) {
-                appendMenuOptions(data.menu);
+        .then(response => readEvents(response, createEventHandler()))
+        .catch(error => console.error("Error:", error));
+    }
+
+    function createEventHandler() {
+        let textDiv = null;
+        let text = "";
+
+        return function (event, data) {
+            if (event === "token") {
+                text += data.text;
+                if (!textDiv) {
+                    textDiv = appendMessage(text, "bot");
+                } else {
+                    textDiv.innerHTML = text;
+                    chatBox.scrollTop = chatBox.scrollHeight;
+                }
+            } else if (event === "done") {
+                if (data.job_id) {
+                    pollJob(data.job_id);
+                }
+                if (data.menu) {
+                    appendMenuOptions(data.menu);
+                }
+                if (data.reset) {
+                    setTimeout(resetChat, 2000);
+                }
             }
-            if (data.reset) {
-                setTimeout(resetChat, 2000);
+        };
+    }
+
+    const JOB_STAGES = ["fetched", "chunked", "embedded", "indexed"];
+    const COLLECTION_NAMES = { specification: "Specification", test_cases: "Test Cases" };
+
+    function describeJob(job) {
+        const name = COLLECTION_NAMES[job.collection] || job.collection;
+        if (job.status === "completed") return `✅ ${name} document has been loaded successfully.`;
+        if (job.status === "failed") return `❌ Loading the ${name} document failed: ${job.error}`;
+        if (job.status === "cancelled") return `${name} document loading was cancelled.`;
+
+        const stages = JOB_STAGES.map(stage => {
+            const count = job.progress[stage];
+            return count === null ? `${stage} …` : `${stage} ✓ (${count})`;
+        });
+        return `⏳ Loading the ${name} document: ${stages.join(", ")}`;
+    }
+
+    function pollJob(jobId) {
+        const statusDiv = appendMessage("⏳ Loading the document…", "bot");
+
+        const timer = setInterval(() => {
+            fetch(`/jobs/${jobId}`)
+            .then(response => response.json())
+            .then(job => {
+                if (job.error && !job.status) throw new Error(job.error);
+                statusDiv.innerHTML = describeJob(job);
+                if (!["queued", "running"].includes(job.status)) {
+                    clearInterval(timer);
+                }
+            })
+            .catch(error => {
+                console.error("Error:", error);
+                clearInterval(timer);
+            });
+        }, 1000);
+    }
+
+    async function readEvents(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Server-Sent Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = "message";
+                let data = "";
+                rawEvent.split("\n").forEach(line => {
+                    if (line.startsWith("event: ")) event = line.slice(7);
+                    else if (line.startsWith("data: ")) data += line.slice(6);
+                });
+                onEvent(event, JSON.parse(data));
             }
-        })
-        .catch(error => console.error("Error:", error));
+        }
     }
 
     function appendMessage(message, sender) {
@@ -76,6 +157,7 @@ document.addEventListener("DOMContentLoaded", function () {
         chatBox.appendChild(messageDiv);
         chatBox.scrollTop = chatBox.scrollHeight;
         lastSender = sender;
+        return textDiv;
     }
 
     function appendMenuOptions(options) {
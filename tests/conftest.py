@@ -0,0 +1,5 @@
+import os
+
+# backend.config validates these on import; the tests use no Google services
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("GOOGLE_CREDENTIALS_PATH", os.devnull)
@@ -0,0 +1,193 @@
+import threading
+import pytest
+from backend.app.ingestion_jobs import IngestionJobQueue
+from backend.app.job_store import InMemoryJobStore, RedisJobStore
+
+
+TIMEOUT = 5
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return InMemoryJobStore(retention_seconds=60)
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # Lua scripting of fakeredis
+    return RedisJobStore(retention_seconds=60, lock_timeout=TIMEOUT, client=fakeredis.FakeRedis())
+
+
+class Recorder:
+    """Loader and callbacks of a job that record what happened, so a test can step through the job."""
+
+    def __init__(self, store_before_check: bool = False) -> None:
+        self.store_before_check = store_before_check
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.stored = []
+        self.completed = []
+        self.discarded = []
+
+    def load(self, job) -> None:
+        self.started.set()
+        if self.store_before_check:
+            self.stored.append(job.doc_link)
+        assert self.release.wait(TIMEOUT)
+        if not self.store_before_check and not job.is_cancelled():
+            self.stored.append(job.doc_link)
+
+    def submit(self, queue: IngestionJobQueue, user_id: str, doc_link: str, collection: str = "specification"):
+        return queue.submit(user_id=user_id, collection=collection, doc_link=doc_link, load=self.load,
+                            on_complete=self.completed.append, on_discard=self.discarded.append)
+
+
+def test_job_completes(store):
+    queue = IngestionJobQueue(max_workers=1, store=store)
+    recorder = Recorder()
+    recorder.release.set()
+
+    job = recorder.submit(queue, "user", "doc")
+    assert queue.wait_for_user("user", timeout=TIMEOUT) == []
+
+    assert queue.get(job.id).status == "completed"
+    assert recorder.stored == ["doc"]
+    assert [completed.id for completed in recorder.completed] == [job.id]
+
+
+def test_failed_job_is_reported(store):
+    queue = IngestionJobQueue(max_workers=1, store=store)
+
+    def fail(job):
+        raise ValueError("not a Google Doc")
+
+    job = queue.submit(user_id="user", collection="specification", doc_link="doc", load=fail,
+                       on_complete=lambda job: None, on_discard=lambda job: None)
+    failed = queue.wait_for_user("user", timeout=TIMEOUT)
+
+    assert [failed_job.id for failed_job in failed] == [job.id]
+    assert queue.get(job.id).to_dict()["error"] == "not a Google Doc"
+
+
+def test_cancel_while_queued(store):
+    queue = IngestionJobQueue(max_workers=1, store=store)
+    blocker, recorder = Recorder(), Recorder()
+    recorder.release.set()
+    blocker.submit(queue, "other", "blocking doc")
+    assert blocker.started.wait(TIMEOUT)
+
+    job = recorder.submit(queue, "user", "doc")
+    queue.cancel_user("user")
+    blocker.release.set()
+    queue.wait_for_user("other", timeout=TIMEOUT)
+
+    assert queue.get(job.id).status == "cancelled"
+    assert not recorder.started.is_set()
+    assert recorder.completed == recorder.discarded == []
+    assert queue.get_user_jobs("user") == {}
+
+
+def test_cancel_while_running_stops_before_storing(store):
+    queue = IngestionJobQueue(max_workers=1, store=store)
+    recorder = Recorder()
+    job = recorder.submit(queue, "user", "doc")
+    assert recorder.started.wait(TIMEOUT)
+
+    queue.cancel_user("user")
+    recorder.release.set()
+    queue.wait_for_user("user", timeout=TIMEOUT)
+    assert _wait_until(lambda: [discarded.id for discarded in recorder.discarded] == [job.id])
+
+    assert queue.get(job.id).status == "cancelled"
+    assert recorder.stored == []
+    assert recorder.completed == []
+
+
+def test_cancel_while_running_discards_what_was_stored(store):
+    queue = IngestionJobQueue(max_workers=1, store=store)
+    recorder = Recorder(store_before_check=True)
+    job = recorder.submit(queue, "user", "doc")
+    assert recorder.started.wait(TIMEOUT)
+
+    queue.cancel_user("user")
+    recorder.release.set()
+
+    assert _wait_until(lambda: [discarded.id for discarded in recorder.discarded] == [job.id])
+    assert recorder.stored == ["doc"]
+    assert recorder.completed == []
+    assert queue.get(job.id).status == "cancelled"
+
+
+def test_resubmit_cancels_previous_job_and_runs_after_it(store):
+    queue = IngestionJobQueue(max_workers=2, store=store)
+    first, second = Recorder(), Recorder()
+    first_job = first.submit(queue, "user", "first doc")
+    assert first.started.wait(TIMEOUT)
+
+    second_job = second.submit(queue, "user", "second doc")
+    # The second job waits for the first one to finish, although a worker thread is free
+    assert not second.started.wait(0.2)
+    assert queue.get(first_job.id).status == "cancelled"
+
+    first.release.set()
+    assert second.started.wait(TIMEOUT)
+    second.release.set()
+    assert queue.wait_for_user("user", timeout=TIMEOUT) == []
+
+    assert first.stored == [] and first.completed == [] and first.discarded == []
+    assert second.stored == ["second doc"]
+    assert [completed.id for completed in second.completed] == [second_job.id]
+    assert queue.get_user_jobs("user")["specification"].id == second_job.id
+
+
+def test_other_collections_are_not_cancelled(store):
+    queue = IngestionJobQueue(max_workers=2, store=store)
+    spec, tests = Recorder(), Recorder()
+    spec_job = spec.submit(queue, "user", "spec doc", collection="specification")
+    tests_job = tests.submit(queue, "user", "test cases doc", collection="test_cases")
+
+    spec.release.set()
+    tests.release.set()
+    assert queue.wait_for_user("user", timeout=TIMEOUT) == []
+
+    assert queue.get(spec_job.id).status == queue.get(tests_job.id).status == "completed"
+
+
+def test_wait_for_user_times_out(store):
+    queue = IngestionJobQueue(max_workers=1, store=store)
+    recorder = Recorder()
+    job = recorder.submit(queue, "user", "doc")
+
+    assert queue.wait_for_user("user", timeout=0.1) == []
+    assert queue.get(job.id).status in ("queued", "running")
+    recorder.release.set()
+    queue.wait_for_user("user", timeout=TIMEOUT)
+
+
+def test_jobs_are_shared_between_processes():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    worker, other_worker = (
+        IngestionJobQueue(max_workers=1, store=RedisJobStore(retention_seconds=60, lock_timeout=TIMEOUT,
+                                                             client=fakeredis.FakeRedis(server=server)))
+        for _ in range(2)
+    )
+    recorder = Recorder(store_before_check=True)
+    job = recorder.submit(worker, "user", "doc")
+    assert recorder.started.wait(TIMEOUT)
+
+    assert other_worker.get(job.id).status == "running"
+    assert other_worker.wait_for_user("user", timeout=0.1) == []
+    other_worker.cancel_user("user")
+    recorder.release.set()
+
+    assert _wait_until(lambda: [discarded.id for discarded in recorder.discarded] == [job.id])
+    assert other_worker.get(job.id).status == "cancelled"
+
+
+def _wait_until(condition, timeout: float = TIMEOUT) -> bool:
+    event = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return True
+        event.wait(0.01)
+    return condition()
@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+from backend.services.vector_db import VectorDB
+from backend.services.vector_index import VectorIndexFactory
+
+
+DIMENSION = 16
+COLLECTION = "specification"
+
+
+def _vectors(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).random((count, DIMENSION), dtype=np.float32)
+
+
+def _store(db: VectorDB, user_id: str, doc_ids, vectors: np.ndarray, **metadata) -> None:
+    db.store_data([f"text of {doc_id}" for doc_id in doc_ids], vectors, list(doc_ids),
+                  [{"user_id": user_id, **metadata} for _ in doc_ids], COLLECTION)
+
+
+def _closest(db: VectorDB, user_id: str, vector: np.ndarray):
+    return db.retrieve_relevant_data(vector.tolist(), COLLECTION, {"user_id": user_id},
+                                     distance_threshold=100, top_k=1)
+
+
+@pytest.fixture(params=[None, "persisted"])
+def db(request, tmp_path):
+    return VectorDB(tmp_path if request.param else None)
+
+
+def test_search_only_sees_own_partition(db):
+    vectors = _vectors(2)
+    _store(db, "alice", ["a"], vectors[:1])
+    _store(db, "bob", ["b"], vectors[1:])
+
+    assert _closest(db, "alice", vectors[1]) == ["text of a"]
+    assert _closest(db, "carol", vectors[0]) == []
+    assert db.get_user_ids() == {"alice", "bob"}
+
+
+def test_upsert_replaces_vector(db):
+    vectors = _vectors(3)
+    _store(db, "alice", ["a", "b"], vectors[:2])
+    db.store_data(["new text of a"], vectors[2:], ["a"], [{"user_id": "alice"}], COLLECTION)
+
+    assert db.get_doc_ids(COLLECTION, "alice") == {"a", "b"}
+    assert _closest(db, "alice", vectors[2]) == ["new text of a"]
+    # "a" is found at its new vector only (FAISS reports squared L2 distances)
+    scored = dict(db.retrieve_scored_data(vectors[0].tolist(), COLLECTION, {"user_id": "alice"},
+                                          distance_threshold=100))
+    assert scored["new text of a"] == pytest.approx(np.sum((vectors[0] - vectors[2]) ** 2), rel=1e-4)
+
+
+def test_delete_documents_and_partitions(db):
+    vectors = _vectors(3)
+    _store(db, "alice", ["a", "b", "c"], vectors)
+
+    db.delete_data(COLLECTION, "alice", ["a", "unknown"])
+    assert db.get_doc_ids(COLLECTION, "alice") == {"b", "c"}
+    assert _closest(db, "alice", vectors[0]) != ["text of a"]
+
+    db.delete_data(COLLECTION, "alice")
+    assert db.get_doc_ids(COLLECTION, "alice") == set()
+    assert _closest(db, "alice", vectors[1]) == []
+    assert db.get_user_ids() == set()
+
+
+def test_delete_user_drops_every_collection(db):
+    vectors = _vectors(2)
+    _store(db, "alice", ["a"], vectors[:1])
+    db.store_data(["test case"], vectors[1:], ["t"], [{"user_id": "alice"}], "test_cases")
+    _store(db, "bob", ["b"], vectors[1:])
+
+    db.delete_user("alice")
+
+    assert db.get_user_ids() == {"bob"}
+    assert db.get_doc_ids("test_cases", "alice") == set()
+
+
+def test_metadata_filters_and_updates(db):
+    vectors = _vectors(2)
+    _store(db, "alice", ["a", "b"], vectors, section="intro")
+    db.update_metadata(COLLECTION, "alice", {"b": {"user_id": "alice", "section": "login"}, "unknown": {}})
+
+    assert db.get_metadata(COLLECTION, "alice")["b"]["section"] == "login"
+    assert db.retrieve_relevant_data(vectors[0].tolist(), COLLECTION, {"user_id": "alice", "section": "login"},
+                                     distance_threshold=100) == ["text of b"]
+
+
+def test_reload_loads_partitions_on_first_use(tmp_path):
+    vectors = _vectors(3)
+    db = VectorDB(tmp_path)
+    _store(db, "alice", ["a", "b"], vectors[:2])
+    _store(db, "bob", ["c"], vectors[2:])
+    db.update_metadata(COLLECTION, "alice", {"a": {"user_id": "alice", "section": "login"}})
+    db.delete_data(COLLECTION, "alice", ["b"])
+
+    reloaded = VectorDB(tmp_path)
+    assert reloaded.index_store == {} and reloaded.next_ids == {}
+    assert reloaded.get_user_ids() == {"alice", "bob"}
+
+    assert _closest(reloaded, "alice", vectors[1]) == ["text of a"]
+    assert reloaded.get_metadata(COLLECTION, "alice") == {"a": {"user_id": "alice", "section": "login"}}
+    assert (COLLECTION, "bob") not in reloaded.index_store
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivfpq"])
+def test_reloaded_index_is_mapped_until_changed(tmp_path, index_type):
+    factory = VectorIndexFactory(index_type, train_threshold=200, pq_m=4)
+    key = (COLLECTION, "alice")
+    vectors = _vectors(300)
+    _store(VectorDB(tmp_path, factory), "alice", [f"d{i}" for i in range(300)], vectors)
+
+    db = VectorDB(tmp_path, factory)
+    assert len(_closest(db, "alice", vectors[0])) == 1
+    assert key in db._mapped
+
+    db.delete_data(COLLECTION, "alice", ["d0", "d1"])
+    _store(db, "alice", ["new"], _vectors(1, seed=1))
+    assert key not in db._mapped
+    assert db.index_store[key].ntotal == 299
+
+    reloaded = VectorDB(tmp_path, factory)
+    with reloaded._locked(key):
+        assert reloaded._get_index(key).ntotal == 299
+    assert reloaded.get_doc_ids(COLLECTION, "alice") == {f"d{i}" for i in range(2, 300)} | {"new"}
+
+
+def test_processes_sharing_a_directory_see_each_others_changes(tmp_path):
+    vectors = _vectors(3)
+    worker, other_worker = VectorDB(tmp_path), VectorDB(tmp_path)
+
+    _store(worker, "alice", ["a"], vectors[:1])
+    assert _closest(other_worker, "alice", vectors[0]) == ["text of a"]
+
+    _store(other_worker, "alice", ["b"], vectors[1:2])
+    assert worker.get_doc_ids(COLLECTION, "alice") == {"a", "b"}
+    assert _closest(worker, "alice", vectors[1]) == ["text of b"]
+
+    other_worker.update_metadata(COLLECTION, "alice", {"a": {"user_id": "alice", "section": "login"}})
+    assert worker.get_metadata(COLLECTION, "alice")["a"]["section"] == "login"
+
+    worker.delete_user("alice")
+    assert _closest(other_worker, "alice", vectors[0]) == []
+    assert other_worker.get_user_ids() == set()
+    assert (COLLECTION, "alice") not in other_worker.next_ids